@@ -9,6 +9,7 @@ from .self_attention_utilities import (
     get_dtype_str,
     kernel_loop,
     load_kernel,
+    output_shape,
 )
 
 _aggregation_refpad_forward_kernel = (
@@ -167,18 +168,15 @@ class AggregationRefpad(Function):
         assert input.dim() == 4 and input.is_cuda and weight.is_cuda
         batch_size, input_channels, input_height, input_width = input.size()
         _, weight_channels, weight_height, weight_width = weight.size()
-        output_height = int(
-            (input_height + 2 * padding[0] - (dilation[0] * (kernel_size[0] - 1) + 1))
-            / stride[0]
-            + 1
-        )
-        output_width = int(
-            (input_width + 2 * padding[1] - (dilation[1] * (kernel_size[1] - 1) + 1))
-            / stride[1]
-            + 1
+        output_height, output_width = output_shape(
+            input_height, input_width, kernel_size, stride, padding, dilation
         )
         assert output_height * output_width == weight_width
-        output = input.new(batch_size, input_channels, output_height, output_width)
+        output = torch.empty(
+            (batch_size, input_channels, output_height, output_width),
+            dtype=input.dtype,
+            device=input.device,
+        )
         n = output.numel()
         with torch.cuda.device_of(input):
             f = load_kernel(
@@ -256,11 +254,15 @@ class AggregationRefpad(Function):
         )
         with torch.cuda.device_of(input):
             if ctx.needs_input_grad[0]:
-                grad_input = input.new(
-                    batch_size,
-                    input_channels,
-                    input_height + 2 * padding[0],
-                    input_width + 2 * padding[1],
+                grad_input = torch.empty(
+                    (
+                        batch_size,
+                        input_channels,
+                        input_height + 2 * padding[0],
+                        input_width + 2 * padding[1],
+                    ),
+                    dtype=input.dtype,
+                    device=input.device,
                 )
                 n = grad_input.numel()
                 opt["nthreads"] = n
@@ -300,7 +302,9 @@ class AggregationRefpad(Function):
                 ]
 
             if ctx.needs_input_grad[1]:
-                grad_weight = weight.new(weight.size())
+                grad_weight = torch.empty_like(
+                    weight, memory_format=torch.contiguous_format
+                )
                 n = grad_weight.numel() // weight.shape[2]
                 opt["nthreads"] = n
                 f = load_kernel(
@@ -9,6 +9,7 @@ from .self_attention_utilities import (
     get_dtype_str,
     kernel_loop,
     load_kernel,
+    output_shape,
 )
 
 _aggregation_zeropad_forward_kernel = (
@@ -133,18 +134,15 @@ class AggregationZeropad(Function):
         assert input.dim() == 4 and input.is_cuda and weight.is_cuda
         batch_size, input_channels, input_height, input_width = input.size()
         _, weight_channels, weight_height, weight_width = weight.size()
-        output_height = int(
-            (input_height + 2 * padding[0] - (dilation[0] * (kernel_size[0] - 1) + 1))
-            / stride[0]
-            + 1
-        )
-        output_width = int(
-            (input_width + 2 * padding[1] - (dilation[1] * (kernel_size[1] - 1) + 1))
-            / stride[1]
-            + 1
+        output_height, output_width = output_shape(
+            input_height, input_width, kernel_size, stride, padding, dilation
         )
         assert output_height * output_width == weight_width
-        output = input.new(batch_size, input_channels, output_height, output_width)
+        output = torch.empty(
+            (batch_size, input_channels, output_height, output_width),
+            dtype=input.dtype,
+            device=input.device,
+        )
         n = output.numel()
         with torch.cuda.device_of(input):
             f = load_kernel(
@@ -213,7 +211,9 @@ class AggregationZeropad(Function):
         )
         with torch.cuda.device_of(input):
             if ctx.needs_input_grad[0]:
-                grad_input = input.new(input.size())
+                grad_input = torch.empty_like(
+                    input, memory_format=torch.contiguous_format
+                )
                 n = grad_input.numel()
                 opt["nthreads"] = n
                 f = load_kernel(
@@ -232,7 +232,9 @@ class AggregationZeropad(Function):
                     stream=Stream(ptr=torch.cuda.current_stream().cuda_stream),
                 )
             if ctx.needs_input_grad[1]:
-                grad_weight = weight.new(weight.size())
+                grad_weight = torch.empty_like(
+                    weight, memory_format=torch.contiguous_format
+                )
                 n = grad_weight.numel() // weight.shape[2]
                 opt["nthreads"] = n
                 f = load_kernel(
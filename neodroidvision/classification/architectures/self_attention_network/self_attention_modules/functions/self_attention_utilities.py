@@ -1,11 +1,23 @@
 from collections import namedtuple
+from functools import lru_cache
 from string import Template
-from typing import Any
+from typing import Any, List, Tuple
 
-import cupy
+import numpy
 import torch
 
-__all__ = ["Stream", "get_dtype_str", "load_kernel"]
+try:
+    import cupy
+except ImportError:  # Only the cuda kernels need cupy, the unfold based functions do not
+    cupy = None
+
+__all__ = [
+    "Stream",
+    "get_dtype_str",
+    "load_kernel",
+    "shape_arguments",
+    "output_shape",
+]
 
 Stream = namedtuple("Stream", ["ptr"])
 
@@ -18,11 +30,68 @@ def get_dtype_str(t: torch.Tensor) -> str:
     raise NotImplemented(f"Tensor type {t} not supported")
 
 
-@cupy.util.memoize(for_each_device=True)
-def load_kernel(kernel_name: Any, code: str, **kwargs) -> Any:
-    code = Template(code).substitute(**kwargs)
-    kernel_code = cupy.cuda.compile_with_cache(code)
-    return kernel_code.get_function(kernel_name)
+if cupy is not None:
+
+    @cupy.util.memoize(for_each_device=True)
+    def load_kernel(kernel_name: Any, code: str, **kwargs) -> Any:
+        code = Template(code).substitute(**kwargs)
+        kernel_code = cupy.cuda.compile_with_cache(code)
+        return kernel_code.get_function(kernel_name)
+
+
+else:
+
+    def load_kernel(kernel_name: Any, code: str, **kwargs) -> Any:
+        raise ImportError(f"cupy is required to compile the {kernel_name} kernel")
+
+
+def shape_arguments(*sizes: int) -> List[numpy.int32]:
+    """
+Sizes passed as kernel arguments rather than substituted into the kernel source, so a compiled kernel
+is reused across input shapes
+
+:param sizes:
+:type sizes:
+:return:
+:rtype:
+"""
+    return [numpy.int32(size) for size in sizes]
+
+
+@lru_cache(maxsize=None)
+def output_shape(
+    input_height: int,
+    input_width: int,
+    kernel_size: Tuple[int, int],
+    stride: Tuple[int, int],
+    padding: Tuple[int, int],
+    dilation: Tuple[int, int],
+) -> Tuple[int, int]:
+    """
+Height and width of the output of a sliding window over the input, in integer arithmetic only
+
+:param input_height:
+:type input_height:
+:param input_width:
+:type input_width:
+:param kernel_size:
+:type kernel_size:
+:param stride:
+:type stride:
+:param padding:
+:type padding:
+:param dilation:
+:type dilation:
+:return:
+:rtype:
+"""
+    output_height = (
+        input_height + 2 * padding[0] - dilation[0] * (kernel_size[0] - 1) - 1
+    ) // stride[0] + 1
+    output_width = (
+        input_width + 2 * padding[1] - dilation[1] * (kernel_size[1] - 1) - 1
+    ) // stride[1] + 1
+    return output_height, output_width
 
 
 CUDA_NUM_THREADS = 1024
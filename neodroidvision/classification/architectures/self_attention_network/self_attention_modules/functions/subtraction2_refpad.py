@@ -11,6 +11,8 @@ from .self_attention_utilities import (
     get_dtype_str,
     kernel_loop,
     load_kernel,
+    output_shape,
+    shape_arguments,
 )
 
 _subtraction2_refpad_forward_kernel = (
@@ -18,34 +20,37 @@ _subtraction2_refpad_forward_kernel = (
     + r"""
 extern "C"
 __global__ void subtraction2_refpad_forward_kernel(
-const ${Dtype}* bottom1_data, const ${Dtype}* bottom2_data, ${Dtype}* top_data) {
-  CUDA_KERNEL_LOOP(index, ${nthreads}) {
-    const int n = index / ${input_channels} / ${top_height} / ${top_width};
-    const int c = (index / ${top_height} / ${top_width}) % ${input_channels};
-    const int h = (index / ${top_width}) % ${top_height};
-    const int w = index % ${top_width};
+    const int nthreads, const int input_channels, const int bottom_height, const int bottom_width,
+    const int top_height, const int top_width,
+    const ${Dtype}* bottom1_data, const ${Dtype}* bottom2_data, ${Dtype}* top_data) {
+  CUDA_KERNEL_LOOP(index, nthreads) {
+    const int n = index / input_channels / top_height / top_width;
+    const int c = (index / top_height / top_width) % input_channels;
+    const int h = (index / top_width) % top_height;
+    const int w = index % top_width;
     const int h_in_center = -${pad_h} + h * ${stride_h} + (${kernel_h} - 1) / 2 * ${dilation_h};
     const int w_in_center = -${pad_w} + w * ${stride_w} + (${kernel_w} - 1) / 2 * ${dilation_w};
-    const int offset_center = ((n * ${input_channels} + c) * ${bottom_height} + h_in_center) *
-    ${bottom_width} + w_in_center;
+    const int offset_center = ((n * input_channels + c) * bottom_height + h_in_center) *
+    bottom_width + w_in_center;
+    const ${Dtype} center = bottom1_data[offset_center];
     for (int kh = 0; kh < ${kernel_h}; ++kh) {
       for (int kw = 0; kw < ${kernel_w}; ++kw) {
         int h_in = -${pad_h} + h * ${stride_h} + kh * ${dilation_h};
         int w_in = -${pad_w} + w * ${stride_w} + kw * ${dilation_w};
-        const int offset_top = ((n * ${input_channels} + c) * ${kernel_h} * ${kernel_w} + (kh * ${kernel_w}
-        + kw)) * ${top_height} * ${top_width} + h * ${top_width} + w;
+        const int offset_top = ((n * input_channels + c) * ${kernel_h} * ${kernel_w} + (kh * ${kernel_w}
+        + kw)) * top_height * top_width + h * top_width + w;
         int offset_bottom;
-        if ((h_in >= 0) && (h_in < ${bottom_height}) && (w_in >= 0) && (w_in < ${bottom_width})) {
-          offset_bottom = ((n * ${input_channels} + c) * ${bottom_height} + h_in) * ${bottom_width} + w_in;
+        if ((h_in >= 0) && (h_in < bottom_height) && (w_in >= 0) && (w_in < bottom_width)) {
+          offset_bottom = ((n * input_channels + c) * bottom_height + h_in) * bottom_width + w_in;
         }
         else {
           if (h_in < 0) h_in = -h_in;
-          if (h_in >= ${bottom_height}) h_in = 2 * (${bottom_height} - 1) - h_in;
+          if (h_in >= bottom_height) h_in = 2 * (bottom_height - 1) - h_in;
           if (w_in < 0) w_in = -w_in;
-          if (w_in >= ${bottom_width}) w_in = 2 * (${bottom_width} - 1) - w_in;
-          offset_bottom = ((n * ${input_channels} + c) * ${bottom_height} + h_in) * ${bottom_width} + w_in;
+          if (w_in >= bottom_width) w_in = 2 * (bottom_width - 1) - w_in;
+          offset_bottom = ((n * input_channels + c) * bottom_height + h_in) * bottom_width + w_in;
         }
-        top_data[offset_top] = bottom1_data[offset_center] - bottom2_data[offset_bottom];
+        top_data[offset_top] = center - bottom2_data[offset_bottom];
       }
     }
   }
@@ -58,20 +63,22 @@ _subtraction2_refpad_input1_backward_kernel = (
     + r"""
 extern "C"
 __global__ void subtraction2_refpad_input1_backward_kernel(
+    const int nthreads, const int input_channels, const int bottom_height, const int bottom_width,
+    const int top_height, const int top_width,
     const ${Dtype}* const top_diff, ${Dtype}* bottom_diff) {
-  CUDA_KERNEL_LOOP(index, ${nthreads}) {
-    const int n = index / ${input_channels} / ${bottom_height} / ${bottom_width};
-    const int c = (index / ${bottom_height} / ${bottom_width}) % ${input_channels};
-    const int h = (index / ${bottom_width}) % ${bottom_height};
-    const int w = index % ${bottom_width};
+  CUDA_KERNEL_LOOP(index, nthreads) {
+    const int n = index / input_channels / bottom_height / bottom_width;
+    const int c = (index / bottom_height / bottom_width) % input_channels;
+    const int h = (index / bottom_width) % bottom_height;
+    const int w = index % bottom_width;
     ${Dtype} value = 0;
     if (((h % ${stride_h}) == 0) && ((w % ${stride_w}) == 0)) {
       const int h_out = h / ${stride_h};
       const int w_out = w / ${stride_w};
       for (int kh = 0; kh < ${kernel_h}; ++kh) {
         for (int kw = 0; kw < ${kernel_w}; ++kw) {
-          const int offset_top = ((n * ${input_channels} + c) * ${kernel_h} * ${kernel_w} +
-          (kh * ${kernel_w} + kw)) * ${top_height} * ${top_width} + h_out * ${top_width} + w_out;
+          const int offset_top = ((n * input_channels + c) * ${kernel_h} * ${kernel_w} +
+          (kh * ${kernel_w} + kw)) * top_height * top_width + h_out * top_width + w_out;
           value += top_diff[offset_top];
         }
       }
@@ -87,14 +94,16 @@ _subtraction2_refpad_input2_backward_kernel = (
     + r"""
 extern "C"
 __global__ void subtraction2_refpad_input2_backward_kernel(
+    const int nthreads, const int input_channels, const int bottom_height, const int bottom_width,
+    const int top_height, const int top_width,
     const ${Dtype}* const top_diff, ${Dtype}* bottom_diff) {
-  CUDA_KERNEL_LOOP(index, ${nthreads}) {
-    const int n = index / ${input_channels} / (${bottom_height} + 2 * ${pad_h}) /
-    (${bottom_width} + 2 * ${pad_w});
-    const int c = (index / (${bottom_height} + 2 * ${pad_h}) / (${bottom_width} + 2 * ${pad_w})) %
-    ${input_channels};
-    const int h = (index / (${bottom_width} + 2 * ${pad_w})) % (${bottom_height} + 2 * ${pad_h});
-    const int w = index % (${bottom_width} + 2 * ${pad_w});
+  CUDA_KERNEL_LOOP(index, nthreads) {
+    const int n = index / input_channels / (bottom_height + 2 * ${pad_h}) /
+    (bottom_width + 2 * ${pad_w});
+    const int c = (index / (bottom_height + 2 * ${pad_h}) / (bottom_width + 2 * ${pad_w})) %
+    input_channels;
+    const int h = (index / (bottom_width + 2 * ${pad_w})) % (bottom_height + 2 * ${pad_h});
+    const int w = index % (bottom_width + 2 * ${pad_w});
     ${Dtype} value = 0;
     for (int kh = 0; kh < ${kernel_h}; ++kh) {
       for (int kw = 0; kw < ${kernel_w}; ++kw) {
@@ -103,9 +112,9 @@ __global__ void subtraction2_refpad_input2_backward_kernel(
         if (((h_out_s % ${stride_h}) == 0) && ((w_out_s % ${stride_w}) == 0)) {
           const int h_out = h_out_s / ${stride_h};
           const int w_out = w_out_s / ${stride_w};
-          if ((h_out >= 0) && (h_out < ${top_height}) && (w_out >= 0) && (w_out < ${top_width})) {
-            const int offset_top = ((n * ${input_channels} + c) * ${kernel_h} * ${kernel_w} +
-            (kh * ${kernel_w} + kw)) * ${top_height} * ${top_width} + h_out * ${top_width} + w_out;
+          if ((h_out >= 0) && (h_out < top_height) && (w_out >= 0) && (w_out < top_width)) {
+            const int offset_top = ((n * input_channels + c) * ${kernel_h} * ${kernel_w} +
+            (kh * ${kernel_w} + kw)) * top_height * top_width + h_out * top_width + w_out;
             value += -top_diff[offset_top];
           }
         }
@@ -158,21 +167,18 @@ class Subtraction2Refpad(Function):
         )
         assert input1.dim() == 4 and input1.is_cuda
         batch_size, input_channels, input_height, input_width = input1.size()
-        output_height = int(
-            (input_height + 2 * padding[0] - (dilation[0] * (kernel_size[0] - 1) + 1))
-            / stride[0]
-            + 1
+        output_height, output_width = output_shape(
+            input_height, input_width, kernel_size, stride, padding, dilation
         )
-        output_width = int(
-            (input_width + 2 * padding[1] - (dilation[1] * (kernel_size[1] - 1) + 1))
-            / stride[1]
-            + 1
-        )
-        output = input1.new(
-            batch_size,
-            input_channels,
-            kernel_size[0] * kernel_size[1],
-            output_height * output_width,
+        output = torch.empty(
+            (
+                batch_size,
+                input_channels,
+                kernel_size[0] * kernel_size[1],
+                output_height * output_width,
+            ),
+            dtype=input1.dtype,
+            device=input1.device,
         )
         n = output.numel() // output.shape[2]
         with torch.cuda.device_of(input1):
@@ -180,13 +186,6 @@ class Subtraction2Refpad(Function):
                 "subtraction2_refpad_forward_kernel",
                 _subtraction2_refpad_forward_kernel,
                 Dtype=get_dtype_str(input1),
-                nthreads=n,
-                num=batch_size,
-                input_channels=input_channels,
-                bottom_height=input_height,
-                bottom_width=input_width,
-                top_height=output_height,
-                top_width=output_width,
                 kernel_h=kernel_size[0],
                 kernel_w=kernel_size[1],
                 stride_h=stride[0],
@@ -199,7 +198,19 @@ class Subtraction2Refpad(Function):
             f(
                 block=(CUDA_NUM_THREADS, 1, 1),
                 grid=(GET_BLOCKS(n), 1, 1),
-                args=[input1.data_ptr(), input2.data_ptr(), output.data_ptr()],
+                args=[
+                    *shape_arguments(
+                        n,
+                        input_channels,
+                        input_height,
+                        input_width,
+                        output_height,
+                        output_width,
+                    ),
+                    input1.data_ptr(),
+                    input2.data_ptr(),
+                    output.data_ptr(),
+                ],
                 stream=Stream(ptr=torch.cuda.current_stream().cuda_stream),
             )
         ctx.save_for_backward(input1, input2)
@@ -227,25 +238,12 @@ class Subtraction2Refpad(Function):
         if not grad_output.is_contiguous():
             grad_output = grad_output.contiguous()
         batch_size, input_channels, input_height, input_width = input1.size()
-        output_height = int(
-            (input_height + 2 * padding[0] - (dilation[0] * (kernel_size[0] - 1) + 1))
-            / stride[0]
-            + 1
-        )
-        output_width = int(
-            (input_width + 2 * padding[1] - (dilation[1] * (kernel_size[1] - 1) + 1))
-            / stride[1]
-            + 1
+        output_height, output_width = output_shape(
+            input_height, input_width, kernel_size, stride, padding, dilation
         )
         grad_input1, grad_input2 = None, None
         opt = dict(
             Dtype=get_dtype_str(grad_output),
-            num=batch_size,
-            input_channels=input_channels,
-            bottom_height=input_height,
-            bottom_width=input_width,
-            top_height=output_height,
-            top_width=output_width,
             kernel_h=kernel_size[0],
             kernel_w=kernel_size[1],
             stride_h=stride[0],
@@ -257,9 +255,10 @@ class Subtraction2Refpad(Function):
         )
         with torch.cuda.device_of(input1):
             if ctx.needs_input_grad[0]:
-                grad_input1 = input1.new(input1.size())
+                grad_input1 = torch.empty_like(
+                    input1, memory_format=torch.contiguous_format
+                )
                 n = grad_input1.numel()
-                opt["nthreads"] = n
                 f = load_kernel(
                     "subtraction2_refpad_input1_backward_kernel",
                     _subtraction2_refpad_input1_backward_kernel,
@@ -268,19 +267,33 @@ class Subtraction2Refpad(Function):
                 f(
                     block=(CUDA_NUM_THREADS, 1, 1),
                     grid=(GET_BLOCKS(n), 1, 1),
-                    args=[grad_output.data_ptr(), grad_input1.data_ptr()],
+                    args=[
+                        *shape_arguments(
+                            n,
+                            input_channels,
+                            input_height,
+                            input_width,
+                            output_height,
+                            output_width,
+                        ),
+                        grad_output.data_ptr(),
+                        grad_input1.data_ptr(),
+                    ],
                     stream=Stream(ptr=torch.cuda.current_stream().cuda_stream),
                 )
         with torch.cuda.device_of(input2):
             if ctx.needs_input_grad[1]:
-                grad_input2 = input2.new(
-                    batch_size,
-                    input_channels,
-                    input_height + 2 * padding[0],
-                    input_width + 2 * padding[1],
+                grad_input2 = torch.empty(
+                    (
+                        batch_size,
+                        input_channels,
+                        input_height + 2 * padding[0],
+                        input_width + 2 * padding[1],
+                    ),
+                    dtype=input2.dtype,
+                    device=input2.device,
                 )
                 n = grad_input2.numel()
-                opt["nthreads"] = n
                 f = load_kernel(
                     "subtraction2_refpad_input2_backward_kernel",
                     _subtraction2_refpad_input2_backward_kernel,
@@ -289,7 +302,18 @@ class Subtraction2Refpad(Function):
                 f(
                     block=(CUDA_NUM_THREADS, 1, 1),
                     grid=(GET_BLOCKS(n), 1, 1),
-                    args=[grad_output.data_ptr(), grad_input2.data_ptr()],
+                    args=[
+                        *shape_arguments(
+                            n,
+                            input_channels,
+                            input_height,
+                            input_width,
+                            output_height,
+                            output_width,
+                        ),
+                        grad_output.data_ptr(),
+                        grad_input2.data_ptr(),
+                    ],
                     stream=Stream(ptr=torch.cuda.current_stream().cuda_stream),
                 )
                 grad_input2[..., padding[0] + 1 : 2 * padding[0] + 1, :] += torch.flip(
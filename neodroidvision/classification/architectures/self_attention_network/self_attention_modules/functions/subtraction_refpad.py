@@ -9,6 +9,7 @@ from .self_attention_utilities import (
     get_dtype_str,
     kernel_loop,
     load_kernel,
+    output_shape,
 )
 
 _subtraction_refpad_forward_kernel = (
@@ -26,6 +27,7 @@ const ${Dtype}* bottom_data, ${Dtype}* top_data) {
     const int w_in_center = -${pad_w} + w * ${stride_w} + (${kernel_w} - 1) / 2 * ${dilation_w};
     const int offset_center = ((n * ${input_channels} + c) * ${bottom_height} + h_in_center) *
     ${bottom_width} + w_in_center;
+    const ${Dtype} center = bottom_data[offset_center];
     for (int kh = 0; kh < ${kernel_h}; ++kh) {
       for (int kw = 0; kw < ${kernel_w}; ++kw) {
         int h_in = -${pad_h} + h * ${stride_h} + kh * ${dilation_h};
@@ -43,7 +45,7 @@ const ${Dtype}* bottom_data, ${Dtype}* top_data) {
           if (w_in >= ${bottom_width}) w_in = 2 * (${bottom_width} - 1) - w_in;
           offset_bottom = ((n * ${input_channels} + c) * ${bottom_height} + h_in) * ${bottom_width} + w_in;
         }
-        top_data[offset_top] = bottom_data[offset_center] - bottom_data[offset_bottom];
+        top_data[offset_top] = center - bottom_data[offset_bottom];
       }
     }
   }
@@ -121,21 +123,18 @@ class SubtractionRefpad(Function):
         )
         assert input.dim() == 4 and input.is_cuda
         batch_size, input_channels, input_height, input_width = input.size()
-        output_height = int(
-            (input_height + 2 * padding[0] - (dilation[0] * (kernel_size[0] - 1) + 1))
-            / stride[0]
-            + 1
+        output_height, output_width = output_shape(
+            input_height, input_width, kernel_size, stride, padding, dilation
         )
-        output_width = int(
-            (input_width + 2 * padding[1] - (dilation[1] * (kernel_size[1] - 1) + 1))
-            / stride[1]
-            + 1
-        )
-        output = input.new(
-            batch_size,
-            input_channels,
-            kernel_size[0] * kernel_size[1],
-            output_height * output_width,
+        output = torch.empty(
+            (
+                batch_size,
+                input_channels,
+                kernel_size[0] * kernel_size[1],
+                output_height * output_width,
+            ),
+            dtype=input.dtype,
+            device=input.device,
         )
         n = output.numel() // output.shape[2]
         with torch.cuda.device_of(input):
@@ -181,15 +180,8 @@ class SubtractionRefpad(Function):
         if not grad_output.is_contiguous():
             grad_output = grad_output.contiguous()
         batch_size, input_channels, input_height, input_width = input.size()
-        output_height = int(
-            (input_height + 2 * padding[0] - (dilation[0] * (kernel_size[0] - 1) + 1))
-            / stride[0]
-            + 1
-        )
-        output_width = int(
-            (input_width + 2 * padding[1] - (dilation[1] * (kernel_size[1] - 1) + 1))
-            / stride[1]
-            + 1
+        output_height, output_width = output_shape(
+            input_height, input_width, kernel_size, stride, padding, dilation
         )
         grad_input = None
         opt = dict(
@@ -211,11 +203,15 @@ class SubtractionRefpad(Function):
         )
         with torch.cuda.device_of(input):
             if ctx.needs_input_grad[0]:
-                grad_input = input.new(
-                    batch_size,
-                    input_channels,
-                    input_height + 2 * padding[0],
-                    input_width + 2 * padding[1],
+                grad_input = torch.empty(
+                    (
+                        batch_size,
+                        input_channels,
+                        input_height + 2 * padding[0],
+                        input_width + 2 * padding[1],
+                    ),
+                    dtype=input.dtype,
+                    device=input.device,
                 )
                 n = grad_input.numel()
                 opt["nthreads"] = n
@@ -1,14 +1,24 @@
+import torch
 from torch import nn
 from torch.nn.modules.utils import _pair
 
-from .. import functional as F
+from .. import functions
+from ..functional import PadModeEnum
+from ..functions import output_shape
+
+try:
+    import cupy
+except ImportError:
+    cupy = None
 
 __all__ = ["Aggregation"]
 
 
 class Aggregation(nn.Module):
     """
-
+Weighted sum over the kernel_size neighbourhood of each output position. Cuda inputs use the cupy kernels,
+which never hold the neighbourhoods in memory. Otherwise the neighbourhoods are unfolded, taking
+kernel_h * kernel_w times the memory of the input, and summed with einsum.
 """
 
     def __init__(self, kernel_size, stride, padding, dilation, pad_mode):
@@ -30,7 +40,7 @@ class Aggregation(nn.Module):
         self.stride = _pair(stride)
         self.padding = _pair(padding)
         self.dilation = _pair(dilation)
-        self.pad_mode = pad_mode
+        self.pad_mode = PadModeEnum(pad_mode)
 
     def forward(self, input, weight):
         """
@@ -42,12 +52,44 @@ class Aggregation(nn.Module):
 :return:
 :rtype:
 """
-        return F.aggregation(
-            input,
-            weight,
+        if input.is_cuda and cupy is not None:
+            if self.pad_mode == PadModeEnum.zero_pad:
+                aggregate = functions.aggregation_zeropad
+            else:
+                aggregate = functions.aggregation_refpad
+            return aggregate(
+                input, weight, self.kernel_size, self.stride, self.padding, self.dilation
+            )
+
+        batch_size, input_channels, input_height, input_width = input.shape
+        weight_channels = weight.shape[1]
+        output_height, output_width = output_shape(
+            input_height,
+            input_width,
             self.kernel_size,
             self.stride,
             self.padding,
             self.dilation,
-            self.pad_mode,
+        )
+
+        if self.pad_mode == PadModeEnum.ref_pad:
+            input = torch.nn.functional.pad(
+                input,
+                [self.padding[1], self.padding[1], self.padding[0], self.padding[0]],
+                mode="reflect",
+            )
+            padding = 0
+        else:
+            padding = self.padding
+        neighbourhood = torch.nn.functional.unfold(
+            input, self.kernel_size, self.dilation, padding, self.stride
+        ).view(
+            batch_size,
+            input_channels // weight_channels,
+            weight_channels,
+            self.kernel_size[0] * self.kernel_size[1],
+            -1,
+        )  # Channel c is weighted by weight channel c % weight_channels
+        return torch.einsum("ngckl,nckl->ngcl", neighbourhood, weight).reshape(
+            batch_size, input_channels, output_height, output_width
         )
@@ -1,23 +1,20 @@
 import copy
 import string
 import time
+from functools import lru_cache
 from pathlib import Path
+from typing import Tuple
 
 import numpy
 import torch
 import tqdm
 from draugr import confusion_matrix_plot
-from draugr.python_utilities import (
-  rgb_drop_alpha_batch_nhwc,
-  torch_vision_normalize_batch_nchw,
-  )
 from draugr.torch_utilities import (
   Split,
   TorchEvalSession,
   TorchTrainSession,
   global_torch_device,
   to_tensor,
-  uint_nhwc_to_nchw_float_batch,
   )
 from matplotlib import pyplot
 from munin.generate_report import ReportEntry, generate_html, generate_pdf
@@ -27,7 +24,32 @@ from warg import NOD
 
 from neodroidvision.data.neodroid_environments.classification.data import default_torch_retransform
 
-__all__ = ["test_model", "pred_target_train_model"]
+__all__ = ["test_model", "pred_target_train_model", "preprocess_batch"]
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+@lru_cache(maxsize=None)
+def _normalisation_affine(device: torch.device) -> Tuple[torch.Tensor, torch.Tensor]:
+  mean = torch.tensor(IMAGENET_MEAN, device=device).view(1, -1, 1, 1)
+  std = torch.tensor(IMAGENET_STD, device=device).view(1, -1, 1, 1)
+  return 1 / (255 * std), -mean / std
+
+
+def preprocess_batch(inputs) -> torch.Tensor:
+  """
+Drops the alpha channel of a uint8 NHWC batch and converts it to an imagenet normalised float NCHW batch,
+in one conversion and one fused scale and shift instead of a pass per step. The result is channels_last
+strided.
+
+  :param inputs:
+  :return:
+  """
+  inputs = to_tensor(inputs)
+  scale, shift = _normalisation_affine(inputs.device)
+  rgb_imgs = inputs[..., :3].permute(0, 3, 1, 2).to(torch.float32)
+  return torch.addcmul(shift, rgb_imgs, scale, out=rgb_imgs)
 
 
 def test_model(model, data_iterator, latest_model_path, num_columns: int = 2):
@@ -129,7 +151,19 @@ def pred_target_train_model(
     test_data_iterator=None,
     num_updates: int = 250000,
     early_stop=None,
+    use_amp: bool = False,
     ) -> torch.nn.Module:
+  """
+
+  :param use_amp: run the forward passes under autocast on cuda, in bfloat16 or float16 with loss scaling
+  where bfloat16 is unsupported
+  """
+  use_amp = use_amp and global_torch_device().type == "cuda"
+  amp_dtype = torch.float16
+  if use_amp and torch.cuda.is_bf16_supported():
+    amp_dtype = torch.bfloat16
+  scaler = torch.amp.GradScaler("cuda", enabled=use_amp and amp_dtype == torch.float16)
+
   best_model_wts = copy.deepcopy(model.state_dict())
   best_val_loss = 1e10
   since = time.time()
@@ -147,20 +181,18 @@ def pred_target_train_model(
           if phase == Split.Training:
             with TorchTrainSession(model):
 
-              input, true_label = zip(*next(train_iterator))
+              input, true_label = next(train_iterator)
 
-              rgb_imgs = torch_vision_normalize_batch_nchw(
-                  uint_nhwc_to_nchw_float_batch(
-                      rgb_drop_alpha_batch_nhwc(to_tensor(input))
-                      )
-                  )
+              rgb_imgs = preprocess_batch(input)
               true_label = to_tensor(true_label, dtype=torch.long)
               optimizer.zero_grad()
 
-              pred = model(rgb_imgs)
-              loss = criterion(pred, true_label)
-              loss.backward()
-              optimizer.step()
+              with torch.autocast(device_type="cuda", dtype=amp_dtype, enabled=use_amp):
+                pred = model(rgb_imgs)
+                loss = criterion(pred, true_label)
+              scaler.scale(loss).backward()
+              scaler.step(optimizer)
+              scaler.update()
 
               if last_out is None:
                 last_out = pred
@@ -176,18 +208,16 @@ def pred_target_train_model(
                 scheduler.step()
           elif test_data_iterator:
             with TorchEvalSession(model):
-              test_rgb_imgs, test_true_label = zip(*next(train_iterator))
-              test_rgb_imgs = torch_vision_normalize_batch_nchw(
-                  uint_nhwc_to_nchw_float_batch(
-                      rgb_drop_alpha_batch_nhwc(to_tensor(test_rgb_imgs))
-                      )
-                  )
+              test_rgb_imgs, test_true_label = next(train_iterator)
+              test_rgb_imgs = preprocess_batch(test_rgb_imgs)
 
               test_true_label = to_tensor(
                   test_true_label, dtype=torch.long
                   )
 
-              with torch.no_grad():
+              with torch.no_grad(), torch.autocast(
+                  device_type="cuda", dtype=amp_dtype, enabled=use_amp
+                  ):
                 val_pred = model(test_rgb_imgs)
                 val_loss = criterion(val_pred, test_true_label)
 
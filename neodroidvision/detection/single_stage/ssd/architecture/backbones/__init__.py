@@ -26,8 +26,8 @@ def efficient_net_b3_factory(image_size, pretrained=True):
     return model
 
 
-def vgg_factory(IMAGE_SIZE, pretrained=True):
-    model = VGG(IMAGE_SIZE)
+def vgg_factory(IMAGE_SIZE, pretrained=True, compiled=False, autocast=False):
+    model = VGG(IMAGE_SIZE, compiled=compiled, autocast=autocast)
     if pretrained:
         model.init_from_pretrain(
             load_state_dict_from_url(
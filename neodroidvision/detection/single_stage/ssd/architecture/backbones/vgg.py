@@ -1,12 +1,13 @@
 from enum import Enum
-from typing import List, Union
+from functools import lru_cache, partial
+from typing import Callable, List, Tuple, Union
 
+import torch
 import torch.nn as nn
-import torch.nn.functional as F
 from neodroidvision.detection.single_stage.ssd.architecture.backbones.ssd_backbone import (
     SSDBackbone,
 )
-from neodroidvision.utilities.torch_utilities import L2Norm
+from neodroidvision.utilities.torch_utilities import ConvReLU2d, L2Norm
 from torch import Tensor
 
 
@@ -60,46 +61,54 @@ class VGG(SSDBackbone):
         VggSize.s512: [256, "S", 512, 128, "S", 256, 128, "S", 256, 128, "S", 256],
     }
 
+    l2_norm_index = 23  # Conv4_3 output, the first feature map
+
     @staticmethod
-    def add_vgg(cfg, batch_norm: bool = False, *, in_channels: int = 3):
+    @lru_cache(maxsize=None)
+    def _vgg_factories(
+        cfg: Tuple, batch_norm: bool, in_channels: int
+    ) -> Tuple[Callable[[], nn.Module], ...]:
         layers = []
 
         for v in cfg:
             if v == "M":
-                layers += [nn.MaxPool2d(kernel_size=2, stride=2)]
+                layers += [partial(nn.MaxPool2d, kernel_size=2, stride=2)]
             elif v == "C":
-                layers += [nn.MaxPool2d(kernel_size=2, stride=2, ceil_mode=True)]
+                layers += [partial(nn.MaxPool2d, kernel_size=2, stride=2, ceil_mode=True)]
             else:
-                conv2d = nn.Conv2d(in_channels, v, kernel_size=3, padding=1)
-                if batch_norm:
-                    layers += [conv2d, nn.BatchNorm2d(v), nn.ReLU(inplace=True)]
-                else:
-                    layers += [conv2d, nn.ReLU(inplace=True)]
+                layers += [  # Identity keeps the layer indices of pretrained state dicts
+                    partial(
+                        ConvReLU2d,
+                        in_channels,
+                        v,
+                        kernel_size=3,
+                        padding=1,
+                        batch_norm=batch_norm,
+                    ),
+                    nn.Identity,
+                ]
                 in_channels = v
         layers += [
-            nn.MaxPool2d(kernel_size=3, stride=1, padding=1),
-            nn.Conv2d(512, 1024, kernel_size=3, padding=6, dilation=6),
-            nn.ReLU(inplace=True),
-            nn.Conv2d(1024, 1024, kernel_size=1),
-            nn.ReLU(inplace=True),
+            partial(nn.MaxPool2d, kernel_size=3, stride=1, padding=1),
+            partial(ConvReLU2d, 512, 1024, kernel_size=3, padding=6, dilation=6),
+            nn.Identity,
+            partial(ConvReLU2d, 1024, 1024, kernel_size=1),
+            nn.Identity,
         ]
-        return layers
+        return tuple(layers)
 
     @staticmethod
-    def add_extras(cfg, start_in_c_num: Union[str, int], vgg_size: VggSize = 300):
-        """
-Extra layers added to VGG for feature scaling
-
-:param cfg:
-:type cfg:
-:param start_in_c_num:
-:type start_in_c_num:
-:param vgg_size:
-:type vgg_size:
-:return:
-:rtype:
-"""
+    def add_vgg(cfg, batch_norm: bool = False, *, in_channels: int = 3):
+        return [
+            make_layer()
+            for make_layer in VGG._vgg_factories(tuple(cfg), batch_norm, in_channels)
+        ]
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _extras_factories(
+        cfg: Tuple, start_in_c_num: Union[str, int], vgg_size: VggSize
+    ) -> Tuple[Callable[[], nn.Module], ...]:
         layers = []
         in_channels = start_in_c_num
         flag = False
@@ -107,7 +116,8 @@ Extra layers added to VGG for feature scaling
             if in_channels != "S":
                 if v == "S":
                     layers += [
-                        nn.Conv2d(
+                        partial(
+                            nn.Conv2d,
                             in_channels,
                             cfg[k + 1],
                             kernel_size=(1, 3)[flag],
@@ -116,48 +126,154 @@ Extra layers added to VGG for feature scaling
                         )
                     ]
                 else:
-                    layers += [nn.Conv2d(in_channels, v, kernel_size=(1, 3)[flag])]
+                    layers += [
+                        partial(nn.Conv2d, in_channels, v, kernel_size=(1, 3)[flag])
+                    ]
                 flag = not flag
             in_channels = v
 
         if vgg_size == VGG.VggSize.s512:
-            layers.append(nn.Conv2d(in_channels, 128, kernel_size=1, stride=1))
-            layers.append(nn.Conv2d(128, 256, kernel_size=4, stride=1, padding=1))
+            layers.append(partial(nn.Conv2d, in_channels, 128, kernel_size=1, stride=1))
+            layers.append(
+                partial(nn.Conv2d, 128, 256, kernel_size=4, stride=1, padding=1)
+            )
+
+        return tuple(layers)
+
+    @staticmethod
+    def add_extras(cfg, start_in_c_num: Union[str, int], vgg_size: VggSize = 300):
+        """
+Extra layers added to VGG for feature scaling
+
+:param cfg:
+:type cfg:
+:param start_in_c_num:
+:type start_in_c_num:
+:param vgg_size:
+:type vgg_size:
+:return:
+:rtype:
+"""
+        return [
+            make_layer()
+            for make_layer in VGG._extras_factories(
+                tuple(cfg), start_in_c_num, vgg_size
+            )
+        ]
 
-        return layers
+    def __init__(
+        self, vgg_size: VggSize, compiled: bool = False, autocast: bool = False
+    ):
+        """
 
-    def __init__(self, vgg_size: VggSize):
+:param vgg_size:
+:param compiled: Compile forward into a single cuda graph, needs torch>=2.2 and fixed input shapes
+:param autocast: Run cuda inference in bfloat16, or float16 where unsupported, trading precision for speed
+"""
         super().__init__(vgg_size)
+        self.autocast = autocast
         if not isinstance(vgg_size, VGG.VggSize):
             vgg_size = VGG.VggSize(str(vgg_size))
         assert isinstance(vgg_size, VGG.VggSize)
         vgg_config = self.vgg_base[vgg_size]
         extras_config = self.extras_base[vgg_size]
 
-        self.vgg = nn.ModuleList(self.add_vgg(vgg_config))
-        self.extras = nn.ModuleList(
-            self.add_extras(extras_config, start_in_c_num=1024, vgg_size=vgg_size)
+        vgg_layers = self.add_vgg(vgg_config)
+        self.vgg_block1 = nn.Sequential(*vgg_layers[: self.l2_norm_index])
+        self.vgg_block2 = nn.Sequential(*vgg_layers[self.l2_norm_index :])
+        extras = self.add_extras(
+            extras_config, start_in_c_num=1024, vgg_size=vgg_size
         )
+        self.extra_blocks = nn.ModuleList(
+            nn.Sequential(
+                extras[i], nn.ReLU(inplace=True), extras[i + 1], nn.ReLU(inplace=True)
+            )
+            for i in range(0, len(extras), 2)
+        )  # Each pair of extra layers outputs a feature map
+        self._register_load_state_dict_pre_hook(self._remap_flat_keys)
         self.l2_norm = L2Norm(512, scale=20)
         self.reset_parameters()
+        self.to(memory_format=torch.channels_last)
+        if compiled:
+            self.compile(mode="reduce-overhead", fullgraph=True)
+
+    @property
+    def vgg(self) -> nn.ModuleList:
+        """
+The vgg layers as one flat list, sharing modules with vgg_block1 and vgg_block2
+
+:return:
+:rtype:
+"""
+        return nn.ModuleList([*self.vgg_block1, *self.vgg_block2])
+
+    @property
+    def extras(self) -> nn.ModuleList:
+        """
+The extra conv layers as one flat list, sharing modules with extra_blocks
+
+:return:
+:rtype:
+"""
+        return nn.ModuleList(
+            [layer for block in self.extra_blocks for layer in (block[0], block[2])]
+        )
+
+    def _remap_flat_keys(
+        self,
+        state_dict,
+        prefix,
+        local_metadata,
+        strict,
+        missing_keys,
+        unexpected_keys,
+        error_msgs,
+    ) -> None:
+        """
+Maps keys of state dicts saved with the flat vgg and extras module lists onto the blocks
+"""
+        vgg_prefix, extras_prefix = f"{prefix}vgg.", f"{prefix}extras."
+        for key in list(state_dict):
+            if key.startswith(vgg_prefix):
+                index, name = key[len(vgg_prefix) :].split(".", 1)
+                index = int(index)
+                if index < self.l2_norm_index:
+                    new_key = f"{prefix}vgg_block1.{index}.{name}"
+                else:
+                    new_key = f"{prefix}vgg_block2.{index - self.l2_norm_index}.{name}"
+            elif key.startswith(extras_prefix):
+                index, name = key[len(extras_prefix) :].split(".", 1)
+                index = int(index)
+                new_key = f"{prefix}extra_blocks.{index // 2}.{index % 2 * 2}.{name}"
+            else:
+                continue
+            state_dict[new_key] = state_dict.pop(key)
 
     def init_from_pretrain(self, state_dict):
         self.vgg.load_state_dict(state_dict)
 
     def forward(self, x: Tensor) -> List[Tensor]:
-        features = []
+        if self.training or not self.autocast or not x.is_cuda:
+            return self._forward(x)
+
+        if torch.cuda.is_bf16_supported():
+            dtype = torch.bfloat16
+        else:
+            dtype = torch.float16
+        with torch.autocast(device_type="cuda", dtype=dtype):
+            features = self._forward(x)
+        return [feature.to(x.dtype) for feature in features]  # The heads run in fp32
 
-        for i in range(23):
-            x = self.vgg[i](x)
-        features.append(self.l2_norm(x))  # Conv4_3 L2 normalization
+    def _forward(self, x: Tensor) -> List[Tensor]:
+        x = self.vgg_block1(x.contiguous(memory_format=torch.channels_last))
+        with torch.autocast(device_type=x.device.type, enabled=False):
+            features = [self.l2_norm(x.float())]  # Conv4_3 L2 normalization, in fp32
 
-        for i in range(23, len(self.vgg)):  # apply vgg up to fc7
-            x = self.vgg[i](x)
+        x = self.vgg_block2(x)  # apply vgg up to fc7
         features.append(x)
 
-        for k, v in enumerate(self.extras):
-            x = F.relu(v(x), inplace=True)
-            if k % 2 == 1:
-                features.append(x)
+        for block in self.extra_blocks:
+            x = block(x)
+            features.append(x)
 
         return features
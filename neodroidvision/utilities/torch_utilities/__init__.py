@@ -7,6 +7,7 @@ __doc__ = r"""
 
 from .batch_resampler import *
 from .check_pointer import *
+from .cuda_prefetcher import *
 from .custom_model_caching import *
 from .distributing import *
 from .layers import *
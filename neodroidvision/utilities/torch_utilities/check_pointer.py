@@ -7,9 +7,13 @@ __doc__ = r"""
            Created on 23/03/2020
            """
 
+import inspect
+import io
 import logging
+import pickle
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, Optional, Tuple
 
 import torch
 from neodroidvision.utilities.torch_utilities.custom_model_caching import (
@@ -19,6 +23,16 @@ from torch.nn import Module
 from torch.nn.parallel import DistributedDataParallel
 from torch.optim import Optimizer
 
+try:
+    import safetensors.torch
+except ImportError:
+    safetensors = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 __all__ = ["CheckPointer"]
 
 
@@ -62,7 +76,103 @@ class CheckPointer:
             logger = logging.getLogger(__name__)
         self.logger = logger
 
-    def save(self, name, **kwargs):
+        self._saver_pool = ThreadPoolExecutor(max_workers=1)
+        self._pending: Optional[Future] = None
+        self._staging_buffers: Dict[Tuple, torch.Tensor] = {}
+
+    def _stage(self, obj: Any, key: Tuple = ()) -> Any:
+        """
+Snapshots obj on the cpu, so training can continue while it is written to disk. Cuda tensors are copied
+asynchronously into pinned buffers that are reused between saves.
+
+:param obj:
+:type obj:
+:param key:
+:type key:
+:return:
+:rtype:
+"""
+        if isinstance(obj, torch.Tensor):
+            if not obj.is_cuda:
+                return obj.detach().clone(memory_format=torch.contiguous_format)
+            buffer = self._staging_buffers.get(key)
+            if buffer is None or buffer.shape != obj.shape or buffer.dtype != obj.dtype:
+                buffer = torch.empty(obj.shape, dtype=obj.dtype, pin_memory=True)
+                self._staging_buffers[key] = buffer
+            return buffer.copy_(obj.detach(), non_blocking=True)
+        if isinstance(obj, dict):
+            return {k: self._stage(v, (*key, k)) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return type(obj)(self._stage(v, (*key, i)) for i, v in enumerate(obj))
+        return obj
+
+    @staticmethod
+    def _model_file(f: Any) -> Path:
+        """
+The safetensors file holding the model weights of the checkpoint f
+
+:param f:
+:type f:
+:return:
+:rtype:
+"""
+        f = Path(f)
+        if f.suffix == ".zst":
+            f = f.with_suffix("")
+        return f.with_suffix(".safetensors")
+
+    def _write(
+        self,
+        data: Any,
+        save_file: Path,
+        model_file: Optional[Path],
+        copied: Optional[torch.cuda.Event],
+        tag: bool,
+    ) -> None:
+        if copied is not None:
+            copied.synchronize()  # wait for the device to host copies
+        if model_file is not None:
+            safetensors.torch.save_file(data.pop("model"), str(model_file))
+        if save_file.suffix == ".zst":
+            buffer = io.BytesIO()
+            torch.save(data, buffer)
+            with open(save_file, "wb") as f:
+                with zstandard.ZstdCompressor(level=3, threads=-1).stream_writer(
+                    f
+                ) as writer:
+                    writer.write(buffer.getbuffer())
+        else:
+            torch.save(data, save_file)
+        if tag:  # within the job, so wait() also covers the tag
+            self.tag_last_checkpoint(save_file)
+
+    def wait(self) -> None:
+        """
+Blocks until the last checkpoint has been written, raising any exception from writing it
+
+:return:
+:rtype:
+"""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def save(self, name, full: bool = True, **kwargs):
+        """
+Saves a checkpoint of the model. Plain state dicts are written as safetensors when safetensors is
+installed, with everything else in a sidecar .pth, compressed with zstd when zstandard is installed
+
+:param name:
+:type name:
+:param full: Also save the optimizer and scheduler state, making the checkpoint resumable. Only full
+checkpoints are tagged as the last checkpoint to resume from, so light checkpoints (full=False) should be
+the exception
+:type full:
+:param kwargs: Further data to store in the checkpoint
+:type kwargs:
+:return:
+:rtype:
+"""
         if not self.save_dir:
             return
 
@@ -74,17 +184,33 @@ class CheckPointer:
             data["model"] = self.model.module.state_dict()
         else:
             data["model"] = self.model.state_dict()
-        if self.optimizer is not None:
-            data["optimizer"] = self.optimizer.state_dict()
-        if self.scheduler is not None:
-            data["scheduler"] = self.scheduler.state_dict()
+        if full:
+            if self.optimizer is not None:
+                data["optimizer"] = self.optimizer.state_dict()
+            if self.scheduler is not None:
+                data["scheduler"] = self.scheduler.state_dict()
         data.update(kwargs)
 
         save_file = self.save_dir / f"{name}.pth"
+        if zstandard is not None:
+            save_file = save_file.with_suffix(".pth.zst")
+        model_file = None
+        if safetensors is not None and all(
+            isinstance(v, torch.Tensor) for v in data["model"].values()
+        ):  # Otherwise the weights stay in the .pth
+            model_file = self._model_file(save_file)
         self.logger.info(f"Saving checkpoint to {save_file}")
-        torch.save(data, save_file)
 
-        self.tag_last_checkpoint(save_file)
+        self.wait()  # the staging buffers may still be in use by the previous save
+        data = self._stage(data)
+        copied = None
+        if torch.cuda.is_available():
+            copied = torch.cuda.Event()
+            copied.record()
+
+        self._pending = self._saver_pool.submit(
+            self._write, data, save_file, model_file, copied, full
+        )
 
     def load(self, f: Path = None, use_latest=True):
         if f is None:
@@ -107,12 +233,22 @@ class CheckPointer:
             model = self.model.module
 
         model.load_state_dict(checkpoint.pop("model"))
-        if "optimizer" in checkpoint and self.optimizer:
-            self.logger.info(f"Loading optimizer from {f}")
-            self.optimizer.load_state_dict(checkpoint.pop("optimizer"))
-        if "scheduler" in checkpoint and self.scheduler:
-            self.logger.info(f"Loading scheduler from {f}")
-            self.scheduler.load_state_dict(checkpoint.pop("scheduler"))
+        if self.optimizer:
+            if "optimizer" in checkpoint:
+                self.logger.info(f"Loading optimizer from {f}")
+                self.optimizer.load_state_dict(checkpoint.pop("optimizer"))
+            else:
+                self.logger.warning(
+                    f"{f} is a weights only checkpoint, the optimizer state is not restored"
+                )
+        if self.scheduler:
+            if "scheduler" in checkpoint:
+                self.logger.info(f"Loading scheduler from {f}")
+                self.scheduler.load_state_dict(checkpoint.pop("scheduler"))
+            else:
+                self.logger.warning(
+                    f"{f} is a weights only checkpoint, the scheduler state is not restored"
+                )
 
         # return any further checkpoint data
         return checkpoint
@@ -129,12 +265,68 @@ class CheckPointer:
 
     def tag_last_checkpoint(self, last_filename) -> None:
         with open(str(self.save_dir / self._last_checkpoint_name), "w") as f:
-            f.write(last_filename)
+            f.write(str(last_filename))
 
-    def _load_file(self, f: str) -> Any:
+    def _load_file(self, f: str, map_location: Any = None) -> Any:
+        """
+Loads a checkpoint straight onto the device of the model, unless another map_location is given. Model
+weights in a safetensors sibling of f are memory mapped rather than unpickled.
+
+:param f:
+:type f:
+:param map_location: As for torch.load. Safetensors weights are loaded straight onto a device or device
+string, and onto the cpu for other map_locations, such as dicts or callables, as load_state_dict copies
+them onto the devices of the model anyway
+:type map_location:
+:return:
+:rtype:
+"""
         # download url files
         if f.startswith("http"):
             # if the file is a url path, download it and cache it
-            f = custom_cache_url(f)
-            self.logger.info(f"url {f} cached in {f}")
-        return torch.load(f, map_location=torch.device("cpu"))
+            url, f = f, str(custom_cache_url(f))
+            self.logger.info(f"url {url} cached in {f}")
+        model_file = self._model_file(f)
+        if f.endswith(".zst"):
+            if zstandard is None:
+                raise ImportError(
+                    f"The zstandard package is required to load the compressed checkpoint {f}"
+                )
+            with open(f, "rb") as compressed:
+                with zstandard.ZstdDecompressor().stream_reader(compressed) as reader:
+                    f = io.BytesIO(reader.read())
+
+        if map_location is None:
+            model = self.model
+            if isinstance(model, DistributedDataParallel):
+                model = model.module
+            parameter = next(model.parameters(), None)
+            if parameter is not None and parameter.is_cuda:
+                map_location = parameter.device
+            else:
+                map_location = torch.device("cpu")
+
+        checkpoint = None
+        if "weights_only" in inspect.signature(torch.load).parameters:
+            try:
+                checkpoint = torch.load(
+                    f, map_location=map_location, weights_only=True
+                )
+            except pickle.UnpicklingError:
+                self.logger.info(f"{f} holds more than tensors, loading it unrestricted")
+                if isinstance(f, io.BytesIO):
+                    f.seek(0)
+        if checkpoint is None:
+            checkpoint = torch.load(f, map_location=map_location)
+
+        if "model" not in checkpoint and model_file.exists():
+            if safetensors is None:
+                raise ImportError(
+                    f"The safetensors package is required to load the model weights in {model_file}"
+                )
+            if not isinstance(map_location, (str, torch.device)):
+                map_location = "cpu"
+            checkpoint["model"] = safetensors.torch.load_file(
+                str(model_file), device=str(map_location)
+            )
+        return checkpoint
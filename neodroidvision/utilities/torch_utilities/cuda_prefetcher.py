@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+           """
+
+from typing import Any, Iterable, Iterator
+
+import torch
+
+__all__ = ["CudaPrefetcher"]
+
+
+class CudaPrefetcher:
+    """
+Wraps an iterable of batches of (preferably pinned) tensors, copying the next batch to the device on a
+side stream while the current batch is computed on
+"""
+
+    def __init__(self, iterable: Iterable, device: torch.device):
+        """
+
+    :param iterable: yields tensors, or tuples, lists or dicts of tensors
+    :param device: the device to move the batches to
+    """
+        self.iterable = iterable
+        self.device = torch.device(device)
+
+    @staticmethod
+    def _apply(batch: Any, fn) -> Any:
+        if isinstance(batch, torch.Tensor):
+            return fn(batch)
+        if isinstance(batch, dict):
+            return {k: CudaPrefetcher._apply(v, fn) for k, v in batch.items()}
+        if isinstance(batch, (list, tuple)):
+            return type(batch)(CudaPrefetcher._apply(v, fn) for v in batch)
+        return batch
+
+    def __iter__(self) -> Iterator:
+        iterator = iter(self.iterable)
+        if self.device.type != "cuda":
+            for batch in iterator:
+                yield self._apply(batch, lambda t: t.to(self.device))
+            return
+
+        stream = torch.cuda.Stream(device=self.device)
+        current = torch.cuda.current_stream(self.device)
+
+        def preload() -> Any:
+            batch = next(iterator, None)
+            if batch is None:
+                return None
+            with torch.cuda.stream(stream):
+                return self._apply(
+                    batch, lambda t: t.to(self.device, non_blocking=True)
+                )
+
+        def claim(t: torch.Tensor) -> torch.Tensor:
+            t.record_stream(current)  # keep the memory alive while current uses it
+            return t
+
+        next_batch = preload()
+        while next_batch is not None:
+            current.wait_stream(stream)
+            batch = self._apply(next_batch, claim)
+            next_batch = preload()
+            yield batch
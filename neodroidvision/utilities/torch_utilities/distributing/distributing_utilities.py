@@ -7,11 +7,14 @@ __doc__ = r"""
            Created on 01/03/2020
            """
 
+import functools
+import inspect
 import logging
 import os
 import sys
+import warnings
 from pathlib import Path
-from typing import Any, List
+from typing import Any, List, Optional, Tuple
 
 import torch
 import torch.utils.data
@@ -23,6 +26,7 @@ from torch import distributed
 
 __all__ = [
     "all_gather_cuda",
+    "all_gather_tensor",
     "reduce_dict",
     "setup_for_distributed",
     "is_distribution_ready",
@@ -34,19 +38,27 @@ __all__ = [
     "set_benchmark_device_dist",
     "synchronise_torch_barrier",
     "setup_distributed_logger",
+    "destroy_distribution",
 ]
 
+def _distribution_state() -> Optional[Tuple[int, int]]:
+    """
+The world size and rank of the process group. Not cached, as the group may be destroyed and initialised
+again with another world size, and querying it is cheap
+
+  :return: None when not distributed
+  """
+    if distributed.is_available() and distributed.is_initialized():
+        return distributed.get_world_size(), distributed.get_rank()
+    return None
+
 
 def is_distribution_ready() -> bool:
     """
 
   :return:
   """
-    if not distributed.is_available():
-        return False
-    if not distributed.is_initialized():
-        return False
-    return True
+    return _distribution_state() is not None
 
 
 def global_world_size() -> int:
@@ -54,9 +66,10 @@ def global_world_size() -> int:
 
   :return:
   """
-    if not is_distribution_ready():
+    state = _distribution_state()
+    if state is None:
         return 1
-    return distributed.get_world_size()
+    return state[0]
 
 
 def global_distribution_rank() -> int:
@@ -64,9 +77,10 @@ def global_distribution_rank() -> int:
 
   :return:
   """
-    if not is_distribution_ready():
+    state = _distribution_state()
+    if state is None:
         return 0
-    return distributed.get_rank()
+    return state[1]
 
 
 def is_main_process() -> bool:
@@ -90,91 +104,181 @@ def save_on_master(*args, **kwargs) -> None:
 
 def setup_for_distributed(is_master: bool) -> None:
     """
-This function disables printing when not in master process
+This function disables printing when not in master process, by sending stdout to devnull once rather
+than wrapping every print call, and only lets warnings through the root logger
 """
-    import builtins as __builtin__
+    if not is_master:
+        sys.stdout = open(os.devnull, "w")
+        logging.getLogger().setLevel(logging.WARNING)
 
-    builtin_print = __builtin__.print
 
-    def print(*args, **kwargs):
-        force = kwargs.pop("force", False)
-        if is_master or force:
-            builtin_print(*args, **kwargs)
+_SIZE_HEADER_BYTES = 4
+_gather_capacity = 1 << 20  # bytes per rank, grows to the largest payload gathered
+_gather_staging: Optional[torch.Tensor] = None  # pinned, reused between gathers
+_warned_pickling_tensors = False
 
-    __builtin__.print = print
 
+def all_gather_tensor(tensor: torch.Tensor) -> torch.Tensor:
+    """
+Run all_gather on a tensor of the same shape on every rank, into one contiguous output
+Args:
+tensor: the tensor of this rank
+Returns:
+Tensor: of shape (world_size, *tensor.shape), row i holding the tensor of rank i
+"""
+    tensor = tensor.contiguous()
+    out = torch.empty(
+        (global_world_size(), *tensor.shape), dtype=tensor.dtype, device=tensor.device
+    )
+    if hasattr(distributed, "all_gather_into_tensor"):
+        distributed.all_gather_into_tensor(out, tensor)
+    else:
+        distributed.all_gather(list(out.unbind(0)), tensor)
+    return out
+
+
+def _is_tensor_dict(data: Any) -> bool:
+    return (
+        isinstance(data, dict)
+        and bool(data)
+        and all(isinstance(v, torch.Tensor) for v in data.values())
+        and len({v.dtype for v in data.values()}) == 1
+    )
 
-def all_gather_cuda(data: Any) -> List[bytes]:
+
+def all_gather_cuda(data: Any, same_shape: bool = False) -> List[Any]:
     """
 Run all_gather on arbitrary picklable data (not necessarily tensors)
 Args:
 data: any picklable object
+same_shape: every rank passes a tensor of the same shape and dtype, or a dict of tensors of one dtype
+with the same keys and shapes, which are then gathered directly without pickling. All ranks must agree
+on this flag, as they must take the same path.
 Returns:
 list[data]: list of data gathered from each rank
 """
+    global _gather_capacity, _gather_staging, _warned_pickling_tensors
+
     world_size = global_world_size()
     if world_size == 1:
         return [data]
 
-    tensor = to_byte_tensor(data, device="cuda")
-
-    # obtain Tensor size of each rank
-    local_size = torch.tensor([tensor.numel()], device="cuda")
-    size_list = [torch.tensor([0], device="cuda") for _ in range(world_size)]
-    distributed.all_gather(size_list, local_size)
-    size_list = [int(size.item()) for size in size_list]
-    max_size = max(size_list)
-
-    # receiving Tensor from all ranks
-    # we pad the tensor because torch all_gather does not support
-    # gathering tensors of different shapes
-    tensor_list = []
-    for _ in size_list:
-        tensor_list.append(torch.empty((max_size,), dtype=torch.uint8, device="cuda"))
-    if local_size != max_size:
-        padding = torch.empty(
-            size=(max_size - local_size,), dtype=torch.uint8, device="cuda"
+    if same_shape:
+        if isinstance(data, torch.Tensor):
+            return list(all_gather_tensor(data.cuda()))
+
+        if not _is_tensor_dict(data):
+            raise ValueError(
+                f"same_shape requires a tensor or a dict of tensors of one dtype, got {data}"
+            )
+        # sort the keys so that they are consistent across processes
+        names = sorted(data.keys())
+        values = [data[k] for k in names]
+        numels = [v.numel() for v in values]
+        flat = torch.cat([v.reshape(-1).cuda() for v in values])
+        return [
+            {k: r.view_as(v) for k, r, v in zip(names, row.split(numels), values)}
+            for row in all_gather_tensor(flat)
+        ]
+
+    if not _warned_pickling_tensors and (
+        isinstance(data, torch.Tensor) or _is_tensor_dict(data)
+    ):
+        _warned_pickling_tensors = True
+        warnings.warn(
+            "all_gather_cuda pickles tensors, pass same_shape=True where every rank gathers the same "
+            "shapes to avoid this",
+            stacklevel=2,
         )
-        tensor = torch.cat((tensor, padding), dim=0)
-    distributed.all_gather(tensor_list, tensor)
 
-    return deserialise_byte_tensor(size_list, tensor_list)
+    payload = to_byte_tensor(data, device="cpu")
+    local_size = payload.numel()
+    while True:
+        # we pad to a capacity shared by all ranks because torch all_gather does not
+        # support gathering tensors of different shapes, the first 4 bytes hold the size
+        capacity = _gather_capacity
+        if _gather_staging is None or _gather_staging.numel() != (
+            _SIZE_HEADER_BYTES + capacity
+        ):
+            _gather_staging = torch.empty(
+                (_SIZE_HEADER_BYTES + capacity,), dtype=torch.uint8, pin_memory=True
+            )
+        tensor = _gather_staging
+        tensor[:_SIZE_HEADER_BYTES] = torch.tensor(
+            [local_size], dtype=torch.int32
+        ).view(torch.uint8)
+        fits = min(local_size, capacity)
+        tensor[_SIZE_HEADER_BYTES : _SIZE_HEADER_BYTES + fits] = payload[:fits]
+        gathered = all_gather_tensor(tensor.cuda(non_blocking=True))
+
+        size_list = (
+            gathered[:, :_SIZE_HEADER_BYTES].cpu().view(torch.int32).view(-1).tolist()
+        )
+        max_size = max(size_list)
+        if max_size <= capacity:
+            break
+        _gather_capacity = max_size  # a payload was cut off, grow and retry
+
+    return deserialise_byte_tensor(size_list, gathered[:, _SIZE_HEADER_BYTES:])
 
 
-def reduce_dict(input_dict: dict, average: bool = True) -> dict:
+def reduce_dict(
+    input_dict: dict, average: bool = True, half_precision: bool = False
+) -> dict:
     """
 Args:
 input_dict (dict): all the values will be reduced
 average (bool): whether to do average or sum
+half_precision (bool): whether to reduce in bfloat16, halving the bytes sent, averages are pre-divided
+so the sum cannot overflow
 Reduce the values in the dictionary from all processes so that all processes
 have the averaged results. Returns a dict with the same fields as
-input_dict, after reduction.
+input_dict, after reduction, all of the dtype the values promote to.
 """
     world_size = global_world_size()
     if world_size < 2:
         return input_dict
     with torch.no_grad():
-        names = []
-        values = []
         # sort the keys so that they are consistent across processes
-        for k in sorted(input_dict.keys()):
-            names.append(k)
-            values.append(input_dict[k])
-        values = torch.stack(values, dim=0)
-        distributed.all_reduce(values)
-        if average:
-            values /= world_size
-        reduced_dict = {k: v for k, v in zip(names, values)}
+        names = sorted(input_dict.keys())
+        values = [input_dict[k] for k in names]
+        numels = [v.numel() for v in values]
+        dtype = functools.reduce(torch.promote_types, (v.dtype for v in values))
+        flat = torch.empty((sum(numels),), dtype=dtype, device=values[0].device)
+        torch.cat([v.reshape(-1) for v in values], out=flat)
+        if half_precision and flat.is_floating_point():
+            if average:
+                flat.div_(world_size)
+            reduced = flat.to(torch.bfloat16)
+            distributed.all_reduce(reduced)
+            flat.copy_(reduced)
+        else:
+            distributed.all_reduce(flat)
+            if average:
+                flat.div_(world_size)
+        reduced_dict = {
+            k: r.view_as(v) for k, r, v in zip(names, flat.split(numels), values)
+        }
     return reduced_dict
 
 
 def init_distributed_mode(args: Any) -> None:
-    if "RANK" in os.environ and "WORLD_SIZE" in os.environ:
-        args.rank = int(os.environ["RANK"])
-        args.world_size = int(os.environ["WORLD_SIZE"])
-        args.gpu = int(os.environ["LOCAL_RANK"])
-    elif "SLURM_PROCID" in os.environ:
-        args.rank = int(os.environ["SLURM_PROCID"])
+    """
+Reads the rank, world size and gpu of this process from the torchrun or slurm environment into args, and
+if distributed joins the process group through set_benchmark_device_dist. Single process runs are left
+untouched
+
+  :param args:
+  :return:
+  """
+    env = os.environ
+    if "RANK" in env and "WORLD_SIZE" in env:
+        args.rank = int(env["RANK"])
+        args.world_size = int(env["WORLD_SIZE"])
+        args.gpu = int(env["LOCAL_RANK"])
+    elif "SLURM_PROCID" in env:
+        args.rank = int(env["SLURM_PROCID"])
+        args.world_size = int(env["SLURM_NTASKS"])
         args.gpu = args.rank % torch.cuda.device_count()
     else:
         print("Not using distributed mode")
@@ -182,17 +286,16 @@ def init_distributed_mode(args: Any) -> None:
         return
 
     args.distributed = True
-    torch.cuda.set_device(args.gpu)
     args.dist_backend = "nccl"
 
     print(f"| distributed init (rank {args.rank}): {args.dist_url}", flush=True)
-    torch.distributed.init_process_group(
-        backend=args.dist_backend,
+    set_benchmark_device_dist(
+        True,
+        args.gpu,
         init_method=args.dist_url,
         world_size=args.world_size,
         rank=args.rank,
     )
-    torch.distributed.barrier()
     setup_for_distributed(args.rank == 0)
 
 
@@ -201,12 +304,13 @@ def synchronise_torch_barrier() -> None:
  Helper function to synchronize (barrier) among all processes when
  using distributed training
 """
-    if not is_distribution_ready():
-        return
-    world_size = distributed.get_world_size()
-    if world_size == 1:
+    if global_world_size() < 2:
         return
-    distributed.barrier()
+    if distributed.get_backend() == "nccl":
+        # place the barrier on the gpu of this process rather than guess it from the rank
+        distributed.barrier(device_ids=[torch.cuda.current_device()])
+    else:
+        distributed.barrier()
 
 
 def setup_distributed_logger(
@@ -239,19 +343,47 @@ def setup_distributed_logger(
     return logger
 
 
-def set_benchmark_device_dist(distributed: bool, local_rank: int) -> None:
+def set_benchmark_device_dist(
+    distributed: bool,
+    local_rank: int,
+    init_method: str = "env://",
+    allow_tf32: bool = False,
+    **kwargs,
+) -> None:
     """
+Enables the cudnn auto-tuner, and if distributed joins the nccl process group on the gpu of local_rank,
+unless it has already been joined
 
   :param distributed:
   :param local_rank:
+  :param init_method:
+  :param allow_tf32: Also run float32 matmuls in TF32, trading precision for speed
+  :param kwargs: further init_process_group arguments, e.g. world_size and rank
   :return:
   """
     if torch.cuda.is_available():
         # This flag allows you to enable the inbuilt cudnn auto-tuner to
         # find the best algorithm to use for your hardware.
         torch.backends.cudnn.benchmark = True
+        if allow_tf32:
+            torch.backends.cuda.matmul.allow_tf32 = True
+
+    if distributed and not is_distribution_ready():
+        device = torch.device(f"cuda:{local_rank}")
+        torch.cuda.set_device(device)
+        init_parameters = inspect.signature(torch.distributed.init_process_group)
+        if "device_id" in init_parameters.parameters:
+            kwargs["device_id"] = device  # lets nccl set up its connections eagerly
+        torch.distributed.init_process_group(
+            backend="nccl", init_method=init_method, **kwargs
+        )
+
 
-    if distributed:
-        torch.cuda.set_device(local_rank)
-        torch.distributed.init_process_group(backend="nccl", init_method="env://")
-        synchronise_torch_barrier()
+def destroy_distribution() -> None:
+    """
+Destroys the process group, if one is initialised
+
+  :return:
+  """
+    if is_distribution_ready():
+        distributed.destroy_process_group()
@@ -11,6 +11,7 @@ import typing
 
 import torch
 from neodroidvision.utilities.torch_utilities.distributing.distributing_utilities import (
+    global_distribution_rank,
     global_world_size,
 )
 from torch import distributed as dist
@@ -49,7 +50,7 @@ loss_dict, after reduction.
             all_losses.append(loss_dict[k])
         all_losses = torch.stack(all_losses, dim=0)
         dist.reduce(all_losses, dst=0)
-        if dist.get_rank() == 0:
+        if global_distribution_rank() == 0:
             # only main process gets accumulated, so only divide by world_size in this case
             all_losses /= world_size
         reduced_losses = {k: v for k, v in zip(loss_names, all_losses)}
@@ -1,5 +1,6 @@
+import io
 import pickle
-from typing import Any, List
+from typing import Any, List, Optional
 
 import torch
 
@@ -7,31 +8,59 @@ __all__ = ['to_byte_tensor', 'serialise_byte_tensor', 'deserialise_byte_tensor']
 
 
 def to_byte_tensor(data: Any, *, device='cuda') -> torch.ByteTensor:
-  return torch.ByteTensor(
-      torch.ByteStorage.from_buffer(pickle.dumps(data)  # gets a byte representation for the data
-                                    )).to(device)  # convert this byte string into a byte tensor
+  buffer = io.BytesIO()
+  pickle.dump(data, buffer)  # gets a byte representation for the data
+  return torch.frombuffer(buffer.getbuffer(), dtype=torch.uint8  # a view of the bytes, no copy
+                          ).to(device, non_blocking=True)
+
+
+_encode_staging: Optional[torch.Tensor] = None  # pinned, reused between encodes
+_encode_copied: Optional[torch.cuda.Event] = None  # the last copy out of _encode_staging
 
 
 def serialise_byte_tensor(encoded_data, data, *, device='cuda') -> None:
   '''
+  Encodes data into encoded_data through a reused pinned staging buffer, with one asynchronous copy
 
   :param encoded_data:
   :param data:
+  :param device: unused, encoded_data decides where the encoding goes
   :return:
   '''
+  global _encode_staging, _encode_copied
 
-  tensor = to_byte_tensor(data, device=device)
-
-  s = tensor.numel()  # encoding: first byte is the size and then rest is the data
+  encoded = pickle.dumps(data)  # gets a byte representation for the data
+  s = len(encoded)  # encoding: first byte is the size and then rest is the data
   assert s <= 255, "Can't encode data greater than 255 bytes"
 
-  encoded_data[0] = s  # put the size in encoded_data
-  encoded_data[1: (s + 1)] = tensor  # put the encoded data in encoded_data
+  if _encode_staging is None:
+    _encode_staging = torch.empty((256,), dtype=torch.uint8, pin_memory=torch.cuda.is_available())
+  if _encode_copied is not None:
+    _encode_copied.synchronize()  # the previous encoding may still be copying out of the buffer
+    _encode_copied = None
+
+  staging = memoryview(_encode_staging.numpy())
+  staging[0] = s  # put the size in encoded_data
+  staging[1: (s + 1)] = encoded  # put the encoded data in encoded_data
+  encoded_data[: (s + 1)].copy_(_encode_staging[: (s + 1)], non_blocking=True)
+  if encoded_data.is_cuda:
+    _encode_copied = torch.cuda.Event()
+    _encode_copied.record(torch.cuda.current_stream(encoded_data.device))
 
 
 def deserialise_byte_tensor(size_list, tensor_list) -> List:
+  '''
+
+  :param size_list: the number of bytes of each tensor that holds data
+  :param tensor_list: a list of equally sized byte tensors, or one tensor with a row per list entry
+  :return:
+  '''
+  if not isinstance(tensor_list, torch.Tensor):
+    tensor_list = torch.stack(tensor_list)
+  rows = tensor_list[:, :max(size_list)].cpu().numpy()  # one device to host copy for all rows
+
   data_list = []
-  for size, tensor in zip(size_list, tensor_list):
-    data_list.append(pickle.loads(tensor.cpu().numpy().tobytes()[:size]))
+  for size, row in zip(size_list, rows):
+    data_list.append(pickle.loads(row[:size].tobytes()))
 
   return data_list
@@ -7,6 +7,8 @@ __doc__ = r"""
            Created on 19/03/2020
            """
 
+from .conv_relu import *
+from .fold_normalisation import *
 from .l2_norm import *
 from .separable_conv import *
 from .torch_layers import *
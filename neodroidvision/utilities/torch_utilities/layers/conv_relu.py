@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+           """
+
+from typing import Optional, Tuple
+
+import torch
+from torch import nn
+from torch.nn import functional as F
+
+__all__ = ["ConvReLU2d"]
+
+
+def _is_exporting_or_compiling() -> bool:
+    """
+cudnn_convolution_relu has no onnx symbolic nor meta/inductor registration, so it must not be traced,
+exported or compiled
+"""
+    compiler = getattr(torch, "compiler", None)
+    return (
+        torch.jit.is_tracing()
+        or torch.jit.is_scripting()
+        or torch.onnx.is_in_onnx_export()
+        or (compiler is not None and compiler.is_compiling())
+    )
+
+
+def _cuda_autocast_dtype() -> Optional[torch.dtype]:
+    """
+The dtype cuda autocast casts to, None when it is disabled
+"""
+    if hasattr(torch, "get_autocast_dtype"):  # torch>=2.4 deprecates the gpu specific calls
+        if torch.is_autocast_enabled("cuda"):
+            return torch.get_autocast_dtype("cuda")
+        return None
+    if torch.is_autocast_enabled():
+        return torch.get_autocast_gpu_dtype()
+    return None
+
+
+class ConvReLU2d(nn.Conv2d):
+    """
+Conv2d followed by an optional BatchNorm2d and a ReLU, computed as a single fused cudnn call on
+cuda in eval mode, with the batch norm folded into the convolution weights.
+"""
+
+    def __init__(self, *args, batch_norm: bool = False, **kwargs):
+        """
+
+    :param args: Conv2d arguments
+    :param batch_norm: Whether to batch normalise the convolution output
+    :param kwargs: Conv2d keyword arguments
+    """
+        super().__init__(*args, **kwargs)
+        assert self.padding_mode == "zeros"
+        if batch_norm:
+            self.batch_norm = nn.BatchNorm2d(self.out_channels)
+        else:
+            self.batch_norm = None
+
+    def folded_parameters(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+Weight and bias of the convolution with the batch norm statistics folded in
+
+    :return:
+    """
+        weight = self.weight
+        bias = self.bias
+        if bias is None:
+            bias = torch.zeros(
+                self.out_channels, dtype=weight.dtype, device=weight.device
+            )
+        if self.batch_norm is not None:
+            scale = self.batch_norm.weight * torch.rsqrt(
+                self.batch_norm.running_var + self.batch_norm.eps
+            )
+            weight = weight * scale.view(-1, 1, 1, 1)
+            bias = (bias - self.batch_norm.running_mean) * scale + self.batch_norm.bias
+        return weight, bias
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """
+
+    :param x:
+    :return:
+    """
+        if self.training and self.batch_norm is not None:
+            return F.relu(self.batch_norm(super().forward(x)), inplace=True)
+
+        weight, bias = self.folded_parameters()
+        if (
+            x.is_cuda
+            and not self.training
+            and not _is_exporting_or_compiling()
+            and (
+                self.kernel_size != (7, 7)
+                or not x.is_contiguous(memory_format=torch.channels_last)
+            )  # The fused path can regress on 7x7 channels_last convolutions
+        ):
+            dtype = _cuda_autocast_dtype()
+            if dtype is not None:  # Not covered by autocast, cast by hand
+                x, weight, bias = x.to(dtype), weight.to(dtype), bias.to(dtype)
+            return torch.cudnn_convolution_relu(
+                x, weight, bias, self.stride, self.padding, self.dilation, self.groups
+            )
+        return F.relu(
+            F.conv2d(
+                x, weight, bias, self.stride, self.padding, self.dilation, self.groups
+            ),
+            inplace=True,
+        )
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+           """
+
+from typing import Sequence
+
+import torch
+from torch import nn
+
+__all__ = ["fold_input_normalisation"]
+
+
+def fold_input_normalisation(
+    conv: nn.Conv2d, mean: Sequence[float], std: Sequence[float]
+) -> nn.Conv2d:
+    """
+Folds a per channel (x - mean) / std input normalisation into the weights and bias of the first
+convolution, so the convolution takes unnormalised input. Only exact without zero padding, as padded
+zeros would no longer be normalised.
+
+    :param conv:
+    :param mean:
+    :param std:
+    :return: conv, modified in place
+    """
+    assert conv.groups == 1 and (
+        conv.padding_mode != "zeros" or all(p == 0 for p in conv.padding)
+    ), "zero padding would change meaning under the folded normalisation"
+    with torch.no_grad():
+        weight = conv.weight
+        mean = torch.as_tensor(mean, dtype=weight.dtype, device=weight.device)
+        std = torch.as_tensor(std, dtype=weight.dtype, device=weight.device)
+        shift = (weight * (mean / std).view(1, -1, 1, 1)).sum(dim=(1, 2, 3))
+        if conv.bias is None:
+            conv.bias = nn.Parameter(-shift)
+        else:
+            conv.bias.sub_(shift)
+        weight.div_(std.view(1, -1, 1, 1))
+    return conv
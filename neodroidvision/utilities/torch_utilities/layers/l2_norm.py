@@ -45,6 +45,10 @@ class L2Norm(nn.Module):
     :param x:
     :return:
     """
-        norm = x.pow(2).sum(dim=1, keepdim=True).sqrt() + self.eps
-        x = torch.div(x, norm)
-        return self.weight.unsqueeze(0).unsqueeze(2).unsqueeze(3).expand_as(x) * x
+        # A single reduction and pointwise chain, which torch.compile fuses into one kernel.
+        # Broadcasting keeps the memory format of x, e.g. channels_last
+        return (
+            x
+            * x.pow(2).sum(dim=1, keepdim=True).add(self.eps).rsqrt()
+            * self.weight.view(1, -1, 1, 1)
+        )
@@ -3,9 +3,9 @@
 import argparse
 import os
 import time
+from pathlib import Path
 
 import torchvision
-from matplotlib import pyplot
 from neodroid.wrappers.observation_wrapper.mixed_observation_wrapper import (
     MixedObservationWrapper,
 )
@@ -14,12 +14,13 @@ from neodroidvision.classification import (
     pred_target_train_model,
     squeezenet_retrain,
 )
-
-from draugr import batch_generator, horizontal_imshow
-from draugr.python_utilities import (
-    rgb_drop_alpha_batch_nhwc,
-    torch_vision_normalize_batch_nchw,
+from neodroidvision.classification.procedures.classification_procedures import (
+    IMAGENET_MEAN,
+    IMAGENET_STD,
 )
+from neodroidvision.utilities import CudaPrefetcher, fold_input_normalisation
+
+from draugr.python_utilities import rgb_drop_alpha_batch_nhwc
 from draugr.torch_utilities import (
     TensorBoardPytorchWriter,
     TorchEvalSession,
@@ -35,6 +36,7 @@ __author__ = "Christian Heider Nielsen"
 
 import torch
 import torch.optim as optim
+from torch.utils.data import DataLoader, IterableDataset
 from tqdm import tqdm
 
 seed = 34874312
@@ -48,10 +50,33 @@ early_stop = 3e-6
 num_updates = 6000
 lr_cycles = 1
 flatt_size = 224 * 224 * 3
+latest_model_link = PROJECT_APP_PATH.user_data / "latest.model"
 
-normalise = torchvision.transforms.Normalize(
-    [0.485, 0.456, 0.406], [0.229, 0.224, 0.225]
-)
+
+def link_latest_model(model_path: Path) -> None:
+    """
+Atomically points latest_model_link at model_path, so continuing training needs no search for it
+
+    :param model_path:
+    :return:
+    """
+    temporary_link = latest_model_link.with_suffix(".tmp")
+    if temporary_link.is_symlink():
+        temporary_link.unlink()
+    temporary_link.symlink_to(model_path)
+    os.replace(temporary_link, latest_model_link)
+
+
+class ObservationDataset(IterableDataset):
+    """
+The (observation, label) samples of a neodroid environment
+"""
+
+    def __init__(self, env):
+        self.env = env
+
+    def __iter__(self):
+        return iter(self.env)
 
 
 def main():
@@ -72,13 +97,26 @@ def main():
     interrupted_path = str(this_model_path / best_model_name)
 
     torch.manual_seed(seed)
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cuda.matmul.allow_tf32 = True
 
     if not options.no_cuda:
         global_torch_device("cpu")
 
     with MixedObservationWrapper() as env:
         env.seed(seed)
-        train_iter = batch_generator(iter(env), batch_size)
+        # the environment connection cannot be shared with worker processes, so batches
+        # are collated into pinned memory here and copied to the device ahead of use
+        train_iter = iter(
+            CudaPrefetcher(
+                DataLoader(
+                    ObservationDataset(env),
+                    batch_size=batch_size,
+                    pin_memory=global_torch_device().type == "cuda",
+                ),
+                global_torch_device(),
+            )
+        )
         num_categories = env.sensor("Class").space.discrete_steps
         test_iter = train_iter
 
@@ -88,11 +126,33 @@ def main():
         model = model.to(global_torch_device())
 
         if options.continue_training:
-            _list_of_files = list(PROJECT_APP_PATH.user_data.rglob("*.model"))
-            lastest_model_path = str(max(_list_of_files, key=os.path.getctime))
+            if latest_model_link.exists():
+                lastest_model_path = str(latest_model_link.resolve())
+            else:  # trees from before the link existed, search for the newest model once
+                print(f"{latest_model_link} not found, searching for the newest model")
+                _list_of_files = [
+                    p
+                    for p in PROJECT_APP_PATH.user_data.rglob("*.model")
+                    if p != latest_model_link
+                ]
+                if not _list_of_files:
+                    raise FileNotFoundError(
+                        f"No model to continue training from in {PROJECT_APP_PATH.user_data}"
+                    )
+                lastest_model_path = str(max(_list_of_files, key=os.path.getctime))
             print(f"loading previous model: {lastest_model_path}")
-            if lastest_model_path is not None:
-                model.load_state_dict(torch.load(lastest_model_path))
+            model.load_state_dict(
+                torch.load(
+                    lastest_model_path,
+                    map_location=global_torch_device(),
+                    weights_only=True,
+                    mmap=True,
+                )
+            )
+
+        # in place, so state dict keys stay unprefixed and export traces eager forward.
+        # without cuda graphs, as the training procedure keeps outputs across steps
+        model.compile(mode="max-autotune-no-cudagraphs")
 
         criterion = torch.nn.CrossEntropyLoss().to(global_torch_device())
 
@@ -115,28 +175,34 @@ def main():
                     interrupted_path,
                     test_data_iterator=test_iter,
                     num_updates=num_updates,
+                    use_amp=True,
                 )
+                if Path(interrupted_path).exists():
+                    link_latest_model(Path(interrupted_path))
 
-            inputs, true_label = zip(*next(train_iter))
-            rgb_imgs = torch_vision_normalize_batch_nchw(
-                uint_nhwc_to_nchw_float_batch(
-                    rgb_drop_alpha_batch_nhwc(to_tensor(inputs))
-                )
+            inputs, true_label = next(train_iter)
+            rgb_imgs = uint_nhwc_to_nchw_float_batch(
+                rgb_drop_alpha_batch_nhwc(to_tensor(inputs))
             )
 
+            # from here on the model normalises its input itself, also in the export
+            fold_input_normalisation(model.features[0], IMAGENET_MEAN, IMAGENET_STD)
+            torch._dynamo.reset()  # recompile against the folded weights
             pred = model(rgb_imgs)
             predicted = torch.argmax(pred, -1)
             true_label = to_tensor(true_label, dtype=torch.long)
             print(predicted, true_label)
-            horizontal_imshow(
-                inputs,
-                [f"p:{int(p)},t:{int(t)}" for p, t in zip(predicted, true_label)],
+            writer.image(
+                "predictions",
+                torchvision.utils.make_grid(rgb_imgs),
+                num_updates,
+                data_formats="CHW",
             )
-            pyplot.show()
 
     torch.cuda.empty_cache()
 
     if options.export:
+        torch._dynamo.reset()
         with TorchEvalSession(model):
             example = torch.rand(1, 3, 256, 256)
             traced_script_module = torch.jit.trace(model.to("cpu"), example)
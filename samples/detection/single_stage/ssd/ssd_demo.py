@@ -89,6 +89,7 @@ def run_demo(cfg, class_names, model_ckpt, score_threshold, images_dir, output_d
 
 
 def main():
+    torch.backends.cudnn.benchmark = True  # let cudnn pick NHWC kernels on first call
     from configs.vgg_ssd300_coco_trainval35k import base_cfg
 
     parser = argparse.ArgumentParser(description="SSD Demo.")
@@ -95,6 +95,7 @@ def run_webcam_demo(
 
 
 def main():
+    torch.backends.cudnn.benchmark = True  # let cudnn pick NHWC kernels on first call
     from configs.vgg_ssd300_coco_trainval35k import base_cfg
 
     parser = argparse.ArgumentParser(description="SSD Demo.")
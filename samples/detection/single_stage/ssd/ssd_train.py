@@ -150,7 +150,12 @@ def inner_train_ssd(*,
                     )
 
             if iteration % kws.save_step == 0:
-                check_pointer.save(f"model_{iteration:06d}", **arguments)
+                check_pointer.save(
+                    f"model_{iteration:06d}",
+                    full=kws.full_save_step is None
+                    or iteration % kws.full_save_step == 0,
+                    **arguments,
+                )
 
             if (
                 kws.eval_step > 0
@@ -176,7 +181,8 @@ def inner_train_ssd(*,
                                 iteration,
                             )
 
-        check_pointer.save("model_final", **arguments)
+        check_pointer.save("model_final", full=True, **arguments)
+        check_pointer.wait()
 
         total_training_time = int(
             time.time() - start_training_time
@@ -264,6 +270,13 @@ def main():
     parser.add_argument(
         "--save_step", default=2500, type=int, help="Save checkpoint every save_step"
     )
+    parser.add_argument(
+        "--full_save_step",
+        default=None,
+        type=int,
+        help="Include optimiser and scheduler state in the checkpoint every full_save_step, defaults to "
+        "every checkpoint. Only these checkpoints are resumed from",
+    )
     parser.add_argument(
         "--eval_step",
         default=2500,
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+
+           Compares Aggregation to the index arithmetic of the aggregation cuda kernels
+           """
+
+import pytest
+import torch
+
+from neodroidvision.classification.architectures.self_attention_network.self_attention_modules.modules import (
+    Aggregation,
+)
+
+CONFIGURATIONS = [  # kernel_size, stride, padding, dilation
+    (3, 1, 1, 1),
+    (3, 2, 1, 1),
+    (5, 1, 4, 2),
+    (3, 1, 0, 1),
+]
+
+
+def _output_size(size, kernel_size, stride, padding, dilation):
+    return (size + 2 * padding - dilation * (kernel_size - 1) - 1) // stride + 1
+
+
+def aggregation_reference(
+    input, weight, kernel_size, stride, padding, dilation, pad_mode
+):
+    if pad_mode == 1:  # Reflection padding, then no further zero padding
+        input = torch.nn.functional.pad(
+            input, [padding, padding, padding, padding], mode="reflect"
+        )
+        padding = 0
+    batch_size, channels, height, width = input.shape
+    weight_channels = weight.shape[1]
+    out_height = _output_size(height, kernel_size, stride, padding, dilation)
+    out_width = _output_size(width, kernel_size, stride, padding, dilation)
+    out = torch.zeros(batch_size, channels, out_height, out_width, dtype=input.dtype)
+    weight_index = torch.arange(channels) % weight_channels
+    for h in range(out_height):
+        for w in range(out_width):
+            for kh in range(kernel_size):
+                for kw in range(kernel_size):
+                    h_in = -padding + h * stride + kh * dilation
+                    w_in = -padding + w * stride + kw * dilation
+                    if 0 <= h_in < height and 0 <= w_in < width:
+                        out[:, :, h, w] += (
+                            weight[
+                                :,
+                                weight_index,
+                                kh * kernel_size + kw,
+                                h * out_width + w,
+                            ]
+                            * input[:, :, h_in, w_in]
+                        )
+    return out
+
+
+def _inputs(kernel_size, stride, padding, dilation):
+    height, width = 7, 6
+    x = torch.randn(2, 4, height, width, dtype=torch.double)
+    out_size = _output_size(height, kernel_size, stride, padding, dilation) * (
+        _output_size(width, kernel_size, stride, padding, dilation)
+    )
+    weight = torch.randn(2, 2, kernel_size ** 2, out_size, dtype=torch.double)
+    return x, weight
+
+
+@pytest.mark.parametrize("kernel_size, stride, padding, dilation", CONFIGURATIONS)
+@pytest.mark.parametrize("pad_mode", [0, 1])
+def test_aggregation(kernel_size, stride, padding, dilation, pad_mode):
+    x, weight = _inputs(kernel_size, stride, padding, dilation)
+    out = Aggregation(kernel_size, stride, padding, dilation, pad_mode)(x, weight)
+    reference = aggregation_reference(
+        x, weight, kernel_size, stride, padding, dilation, pad_mode
+    )
+    assert out.shape == reference.shape
+    assert torch.allclose(out, reference)
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason="needs cuda")
+@pytest.mark.parametrize("kernel_size, stride, padding, dilation", CONFIGURATIONS)
+@pytest.mark.parametrize("pad_mode", [0, 1])
+def test_aggregation_cuda_kernels(kernel_size, stride, padding, dilation, pad_mode):
+    pytest.importorskip("cupy")
+    x, weight = _inputs(kernel_size, stride, padding, dilation)
+    out = Aggregation(kernel_size, stride, padding, dilation, pad_mode)(
+        x.cuda(), weight.cuda()
+    )
+    reference = aggregation_reference(
+        x, weight, kernel_size, stride, padding, dilation, pad_mode
+    )
+    assert torch.allclose(out.cpu(), reference)
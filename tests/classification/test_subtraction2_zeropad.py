@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+
+           Compares the unfold based subtraction2_zeropad to the index arithmetic of the cuda kernel it replaced
+           """
+
+import pytest
+import torch
+
+from neodroidvision.classification.architectures.self_attention_network.self_attention_modules.functions import (
+    subtraction2_zeropad,
+)
+
+CONFIGURATIONS = [  # kernel_size, stride, padding, dilation
+    (3, 1, 1, 1),
+    (3, 2, 1, 1),
+    (5, 1, 4, 2),
+    (3, 1, 0, 1),
+    (3, 2, 0, 1),
+]
+
+
+def _output_size(size, kernel_size, stride, padding, dilation):
+    return (size + 2 * padding - dilation * (kernel_size - 1) - 1) // stride + 1
+
+
+def subtraction2_zeropad_reference(
+    input1, input2, kernel_size, stride, padding, dilation
+):
+    batch_size, channels, height, width = input1.shape
+    out_height = _output_size(height, kernel_size, stride, padding, dilation)
+    out_width = _output_size(width, kernel_size, stride, padding, dilation)
+    out = torch.zeros(
+        batch_size,
+        channels,
+        kernel_size ** 2,
+        out_height * out_width,
+        dtype=input1.dtype,
+    )
+    for h in range(out_height):
+        for w in range(out_width):
+            h_centre = -padding + h * stride + (kernel_size - 1) // 2 * dilation
+            w_centre = -padding + w * stride + (kernel_size - 1) // 2 * dilation
+            for kh in range(kernel_size):
+                for kw in range(kernel_size):
+                    h_in = -padding + h * stride + kh * dilation
+                    w_in = -padding + w * stride + kw * dilation
+                    value = input1[:, :, h_centre, w_centre]
+                    if 0 <= h_in < height and 0 <= w_in < width:
+                        value = value - input2[:, :, h_in, w_in]
+                    out[:, :, kh * kernel_size + kw, h * out_width + w] = value
+    return out
+
+
+@pytest.mark.parametrize("kernel_size, stride, padding, dilation", CONFIGURATIONS)
+def test_subtraction2_zeropad(kernel_size, stride, padding, dilation):
+    x1 = torch.randn(2, 4, 7, 6, dtype=torch.double)
+    x2 = torch.randn(2, 4, 7, 6, dtype=torch.double)
+    out = subtraction2_zeropad(x1, x2, kernel_size, stride, padding, dilation)
+    reference = subtraction2_zeropad_reference(
+        x1, x2, kernel_size, stride, padding, dilation
+    )
+    assert out.shape == reference.shape
+    assert torch.allclose(out, reference)
+
+
+def test_subtraction2_zeropad_gradient():
+    x1 = torch.randn(1, 2, 5, 5, dtype=torch.double, requires_grad=True)
+    x2 = torch.randn(1, 2, 5, 5, dtype=torch.double, requires_grad=True)
+    assert torch.autograd.gradcheck(
+        lambda a, b: subtraction2_zeropad(a, b, 3, 2, 1, 1), (x1, x2)
+    )
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+           """
+
+import torch
+
+from neodroidvision.detection.single_stage.ssd.architecture.backbones.vgg import VGG
+
+
+def _flat_state_dict(model: VGG) -> dict:
+    """
+The state dict of model as saved when vgg and extras were flat module lists
+"""
+    state_dict = {
+        k: v
+        for k, v in model.state_dict().items()
+        if not k.startswith(("vgg_block1.", "vgg_block2.", "extra_blocks."))
+    }
+    for k, v in model.vgg.state_dict().items():
+        state_dict[f"vgg.{k}"] = v
+    for k, v in model.extras.state_dict().items():
+        state_dict[f"extras.{k}"] = v
+    return state_dict
+
+
+def test_loads_flat_state_dicts():
+    torch.manual_seed(0)
+    saved = VGG(VGG.VggSize.s300)
+    flat = _flat_state_dict(saved)
+    assert any(k.startswith("vgg.") for k in flat)
+    assert any(k.startswith("extras.") for k in flat)
+
+    torch.manual_seed(1)
+    loaded = VGG(VGG.VggSize.s300)
+    loaded.load_state_dict(flat)  # strict, so every key must be remapped
+
+    expected = saved.state_dict()
+    for k, v in loaded.state_dict().items():
+        assert torch.equal(v, expected[k]), k
+
+
+def test_flat_layers_share_modules_with_blocks():
+    model = VGG(VGG.VggSize.s300)
+    assert model.vgg[model.l2_norm_index] is model.vgg_block2[0]
+    assert model.extras[1] is model.extra_blocks[0][2]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+
+           Runs all_gather_cuda on a two gpu nccl group
+           """
+
+import warnings
+
+import pytest
+import torch
+from torch import distributed, multiprocessing
+
+from neodroidvision.utilities.torch_utilities.distributing.distributing_utilities import (
+    all_gather_cuda,
+)
+
+WORLD_SIZE = 2
+
+pytestmark = pytest.mark.skipif(
+    not distributed.is_available() or torch.cuda.device_count() < WORLD_SIZE,
+    reason=f"needs {WORLD_SIZE} gpus",
+)
+
+
+def _gather_worker(rank: int, init_file: str, check) -> None:
+    torch.cuda.set_device(rank)
+    distributed.init_process_group(
+        "nccl", init_method=f"file://{init_file}", rank=rank, world_size=WORLD_SIZE
+    )
+    try:
+        check(rank)
+    finally:
+        distributed.destroy_process_group()
+
+
+def _spawn(tmp_path, check) -> None:
+    multiprocessing.spawn(
+        _gather_worker, args=(str(tmp_path / "init"), check), nprocs=WORLD_SIZE
+    )
+
+
+def _check_objects(rank: int) -> None:
+    gathered = all_gather_cuda({"rank": rank, "boxes": list(range(rank * 10))})
+    assert gathered == [
+        {"rank": r, "boxes": list(range(r * 10))} for r in range(WORLD_SIZE)
+    ]
+
+
+def _check_growing_capacity(rank: int) -> None:
+    payload = bytes([rank]) * ((rank + 1) << 20)  # Larger than the initial capacity
+    for _ in range(2):  # The second gather reuses the grown staging buffer
+        gathered = all_gather_cuda(payload)
+        assert gathered == [bytes([r]) * ((r + 1) << 20) for r in range(WORLD_SIZE)]
+
+
+def test_all_gather_objects(tmp_path):
+    _spawn(tmp_path, _check_objects)
+
+
+def test_all_gather_grows_its_capacity(tmp_path):
+    _spawn(tmp_path, _check_growing_capacity)
+
+
+def _check_same_shape(rank: int) -> None:
+    tensor = torch.full((2, 3), float(rank))
+    assert all(
+        torch.equal(g.cpu(), torch.full((2, 3), float(r)))
+        for r, g in enumerate(all_gather_cuda(tensor, same_shape=True))
+    )
+
+    named = {"scores": torch.full((4,), float(rank)), "labels": torch.ones(2, 2)}
+    gathered = all_gather_cuda(named, same_shape=True)
+    for r, g in enumerate(gathered):
+        assert g.keys() == named.keys()
+        assert torch.equal(g["scores"].cpu(), torch.full((4,), float(r)))
+        assert torch.equal(g["labels"].cpu(), torch.ones(2, 2))
+
+    with pytest.raises(ValueError):
+        all_gather_cuda(["not", "tensors"], same_shape=True)
+
+
+def _check_pickling_tensors_warns_once(rank: int) -> None:
+    with pytest.warns(UserWarning, match="same_shape"):
+        all_gather_cuda(torch.zeros(3))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        gathered = all_gather_cuda(torch.zeros(3))
+    assert len(gathered) == WORLD_SIZE
+
+
+def test_all_gather_same_shape(tmp_path):
+    _spawn(tmp_path, _check_same_shape)
+
+
+def test_all_gather_pickling_tensors_warns_once(tmp_path):
+    _spawn(tmp_path, _check_pickling_tensors_warns_once)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+           """
+
+import logging
+
+import pytest
+import torch
+from torch import nn
+
+from neodroidvision.utilities.torch_utilities import check_pointer
+from neodroidvision.utilities.torch_utilities.check_pointer import CheckPointer
+
+
+def _check_pointer(save_dir, seed: int) -> CheckPointer:
+    torch.manual_seed(seed)
+    model = nn.Sequential(nn.Conv2d(3, 4, 3), nn.BatchNorm2d(4), nn.Flatten())
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.1, momentum=0.9)
+    scheduler = torch.optim.lr_scheduler.StepLR(optimizer, step_size=1)
+    model(torch.rand(2, 3, 5, 5)).sum().backward()  # fill the momentum buffers
+    optimizer.step()
+    scheduler.step()
+    return CheckPointer(
+        model, optimizer, scheduler, save_dir=save_dir, save_to_disk=True
+    )
+
+
+def _assert_state_dicts_equal(a: dict, b: dict) -> None:
+    assert a.keys() == b.keys()
+    for k in a:
+        assert torch.equal(a[k], b[k]), k
+
+
+@pytest.fixture(params=["zstd", "uncompressed"])
+def compression(request, monkeypatch):
+    if request.param == "zstd":
+        pytest.importorskip("zstandard")
+    else:
+        monkeypatch.setattr(check_pointer, "zstandard", None)
+    return ".pth.zst" if request.param == "zstd" else ".pth"
+
+
+def test_full_checkpoint_round_trip(tmp_path, compression):
+    saver = _check_pointer(tmp_path, seed=0)
+    saver.save("model_1", iteration=3)  # Full by default
+    saver.wait()
+    assert saver.get_checkpoint_file() == str(tmp_path / f"model_1{compression}")
+
+    loader = _check_pointer(tmp_path, seed=1)
+    extra = loader.load(tmp_path / "ignored", use_latest=True)
+    assert extra == {"iteration": 3}
+    _assert_state_dicts_equal(loader.model.state_dict(), saver.model.state_dict())
+    loaded, saved = loader.optimizer.state_dict(), saver.optimizer.state_dict()
+    assert loaded["param_groups"] == saved["param_groups"]
+    for index, state in saved["state"].items():
+        assert torch.equal(
+            loaded["state"][index]["momentum_buffer"], state["momentum_buffer"]
+        )
+    assert loader.scheduler.state_dict() == saver.scheduler.state_dict()
+
+
+def test_weights_only_checkpoint(tmp_path, compression, caplog):
+    saver = _check_pointer(tmp_path, seed=0)
+    saver.save("model_1")
+    saver.save("model_2", full=False)
+    saver.wait()
+    assert saver.get_checkpoint_file() == str(
+        tmp_path / f"model_1{compression}"
+    )  # Weights only checkpoints are not resume points
+
+    loader = _check_pointer(tmp_path, seed=1)
+    with caplog.at_level(logging.WARNING):
+        loader.load(tmp_path / f"model_2{compression}", use_latest=False)
+    _assert_state_dicts_equal(loader.model.state_dict(), saver.model.state_dict())
+    assert "optimizer state is not restored" in caplog.text
+    assert "scheduler state is not restored" in caplog.text
+
+
+def test_compressed_checkpoint_without_zstandard(tmp_path, monkeypatch):
+    monkeypatch.setattr(check_pointer, "zstandard", None)
+    (tmp_path / "model_1.pth.zst").touch()
+    with pytest.raises(ImportError, match="zstandard"):
+        _check_pointer(tmp_path, seed=0).load(
+            tmp_path / "model_1.pth.zst", use_latest=False
+        )
+
+
+def test_background_save_snapshots_the_state(tmp_path):
+    saver = _check_pointer(tmp_path, seed=0)
+    expected = {k: v.clone() for k, v in saver.model.state_dict().items()}
+    saver.save("model_1")
+    with torch.no_grad():
+        for parameter in saver.model.parameters():
+            parameter.add_(1)  # Training continues while the checkpoint is written
+    saver.wait()
+    assert saver.get_checkpoint_file().startswith(str(tmp_path / "model_1"))
+
+    loader = _check_pointer(tmp_path, seed=1)
+    loader.load(tmp_path / "ignored", use_latest=True)
+    _assert_state_dicts_equal(loader.model.state_dict(), expected)
+
+
+def test_safetensors_round_trip(tmp_path):
+    pytest.importorskip("safetensors")
+    saver = _check_pointer(tmp_path, seed=0)
+    saver.save("model_1")
+    saver.wait()
+    assert (tmp_path / "model_1.safetensors").exists()
+
+    loader = _check_pointer(tmp_path, seed=1)
+    checkpoint = loader._load_file(
+        saver.get_checkpoint_file(), map_location={"cuda:0": "cpu"}
+    )  # Not a device, the weights are loaded onto the cpu
+    _assert_state_dicts_equal(checkpoint["model"], saver.model.state_dict())
+
+
+def test_without_safetensors_keeps_the_weights_in_the_pth(tmp_path, monkeypatch):
+    monkeypatch.setattr(check_pointer, "safetensors", None)
+    saver = _check_pointer(tmp_path, seed=0)
+    saver.save("model_1")
+    saver.wait()
+    assert not (tmp_path / "model_1.safetensors").exists()
+
+    loader = _check_pointer(tmp_path, seed=1)
+    loader.load(tmp_path / "ignored", use_latest=True)
+    _assert_state_dicts_equal(loader.model.state_dict(), saver.model.state_dict())
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+           """
+
+import pytest
+import torch
+from torch.nn import functional as F
+
+from neodroidvision.utilities.torch_utilities.layers import ConvReLU2d
+
+
+@pytest.mark.parametrize("bias", [True, False])
+def test_conv_relu_folds_batch_norm(bias):
+    layer = ConvReLU2d(3, 8, 3, padding=1, bias=bias, batch_norm=True)
+    with torch.no_grad():
+        layer.batch_norm.weight.uniform_(0.5, 1.5)
+        layer.batch_norm.bias.normal_()
+        layer.batch_norm.running_mean.normal_()
+        layer.batch_norm.running_var.uniform_(0.5, 2.0)
+    layer.eval()
+
+    x = torch.randn(2, 3, 9, 9)
+    with torch.no_grad():
+        reference = F.relu(
+            layer.batch_norm(
+                F.conv2d(x, layer.weight, layer.bias, layer.stride, layer.padding)
+            )
+        )
+        assert torch.allclose(layer(x), reference, atol=1e-5)
+
+
+def test_conv_relu_trains_unfolded():
+    layer = ConvReLU2d(3, 8, 3, padding=1, batch_norm=True)
+    x = torch.randn(2, 3, 9, 9)
+    reference = F.relu(
+        F.batch_norm(
+            F.conv2d(x, layer.weight, layer.bias, layer.stride, layer.padding),
+            None,
+            None,
+            layer.batch_norm.weight,
+            layer.batch_norm.bias,
+            training=True,
+        )
+    )
+    assert torch.allclose(layer(x), reference, atol=1e-5)
+
+
+def test_conv_relu_without_batch_norm():
+    layer = ConvReLU2d(3, 8, 3, stride=2).eval()
+    x = torch.randn(2, 3, 9, 9)
+    with torch.no_grad():
+        reference = F.relu(F.conv2d(x, layer.weight, layer.bias, layer.stride))
+        assert torch.allclose(layer(x), reference, atol=1e-6)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+           """
+
+import pytest
+from torch import distributed
+
+from neodroidvision.utilities.torch_utilities.distributing.distributing_utilities import (
+    global_distribution_rank,
+    global_world_size,
+    is_distribution_ready,
+)
+
+
+@pytest.mark.skipif(
+    not distributed.is_available(), reason="torch.distributed is unavailable"
+)
+def test_state_follows_the_process_group(tmp_path):
+    assert not is_distribution_ready()
+    assert global_world_size() == 1 and global_distribution_rank() == 0
+
+    distributed.init_process_group(
+        "gloo", init_method=f"file://{tmp_path / 'init'}", rank=0, world_size=1
+    )
+    try:
+        assert is_distribution_ready()
+        assert global_world_size() == 1 and global_distribution_rank() == 0
+    finally:
+        distributed.destroy_process_group()  # Not through destroy_distribution
+
+    assert not is_distribution_ready()
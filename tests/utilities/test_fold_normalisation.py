@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+           """
+
+import pytest
+import torch
+from torch import nn
+
+from neodroidvision.utilities.torch_utilities.layers import fold_input_normalisation
+
+
+def _normalise(x: torch.Tensor, mean, std) -> torch.Tensor:
+    return (x - torch.tensor(mean).view(1, -1, 1, 1)) / torch.tensor(std).view(
+        1, -1, 1, 1
+    )
+
+
+@pytest.mark.parametrize("bias", [True, False])
+def test_fold_input_normalisation(bias):
+    mean, std = [0.485, 0.456, 0.406], [0.229, 0.224, 0.225]
+    conv = nn.Conv2d(3, 8, 3, stride=2, bias=bias)
+    reference_conv = nn.Conv2d(3, 8, 3, stride=2, bias=bias)
+    reference_conv.load_state_dict(conv.state_dict())
+    fold_input_normalisation(conv, mean, std)
+
+    x = torch.rand(2, 3, 17, 17)
+    with torch.no_grad():
+        assert torch.allclose(
+            conv(x), reference_conv(_normalise(x, mean, std)), atol=1e-4
+        )
+
+
+def test_fold_input_normalisation_rejects_zero_padding():
+    with pytest.raises(AssertionError):
+        fold_input_normalisation(nn.Conv2d(3, 8, 3, padding=1), [0.5] * 3, [0.5] * 3)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+           """
+
+import torch
+
+from neodroidvision.utilities.torch_utilities.layers import L2Norm
+
+
+def l2_norm_reference(x: torch.Tensor, weight: torch.Tensor, eps: float):
+    norm = x.pow(2).sum(dim=1, keepdim=True).sqrt() + eps
+    return weight.view(1, -1, 1, 1) * torch.div(x, norm)
+
+
+def test_l2_norm():
+    layer = L2Norm(8, scale=20)
+    with torch.no_grad():
+        layer.weight.uniform_(10, 30)
+    x = torch.randn(2, 8, 5, 5)
+    with torch.no_grad():
+        assert torch.allclose(
+            layer(x), l2_norm_reference(x, layer.weight, layer.eps), rtol=1e-5
+        )
+
+
+def test_l2_norm_keeps_channels_last():
+    layer = L2Norm(8, scale=20)
+    x = torch.randn(2, 8, 5, 5).contiguous(memory_format=torch.channels_last)
+    with torch.no_grad():
+        out = layer(x)
+        assert out.is_contiguous(memory_format=torch.channels_last)
+        assert torch.allclose(
+            out, l2_norm_reference(x, layer.weight, layer.eps), rtol=1e-5
+        )
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+
+           Runs reduce_dict on a two process gloo group and compares it to the per key stack and all_reduce it
+           replaced
+           """
+
+import pytest
+import torch
+from torch import distributed, multiprocessing
+
+from neodroidvision.utilities.torch_utilities.distributing.distributing_utilities import (
+    reduce_dict,
+)
+
+WORLD_SIZE = 2
+
+pytestmark = pytest.mark.skipif(
+    not distributed.is_available(), reason="torch.distributed is unavailable"
+)
+
+
+def _rank_dict(rank: int) -> dict:
+    generator = torch.Generator().manual_seed(rank)
+    return {
+        "loss": torch.rand((), generator=generator),
+        "accuracy": torch.rand((), generator=generator),
+        "box_loss": torch.rand((), generator=generator) * 100,
+        "accumulated_batches": torch.tensor(rank + 1),  # An int counter, sorted first
+    }
+
+
+def _stacked_reduction(average: bool) -> dict:
+    reduced = {}
+    for k in _rank_dict(0):
+        values = torch.stack(
+            [_rank_dict(rank)[k].to(torch.float) for rank in range(WORLD_SIZE)]
+        ).sum(0)
+        if average:
+            values /= WORLD_SIZE
+        reduced[k] = values
+    return reduced
+
+
+def _reduce_worker(rank: int, init_file: str, average: bool, half_precision: bool):
+    distributed.init_process_group(
+        "gloo", init_method=f"file://{init_file}", rank=rank, world_size=WORLD_SIZE
+    )
+    try:
+        reduced = reduce_dict(
+            _rank_dict(rank), average=average, half_precision=half_precision
+        )
+        reference = _stacked_reduction(average)
+        assert reduced.keys() == reference.keys()
+        tolerance = 1e-2 if half_precision else 1e-6
+        for k, v in reference.items():
+            assert reduced[k].dtype == torch.float, k
+            assert reduced[k].shape == v.shape, k
+            assert torch.allclose(reduced[k], v, rtol=tolerance), k
+    finally:
+        distributed.destroy_process_group()
+
+
+def _spawn(tmp_path, average: bool, half_precision: bool) -> None:
+    multiprocessing.spawn(
+        _reduce_worker,
+        args=(str(tmp_path / "init"), average, half_precision),
+        nprocs=WORLD_SIZE,
+    )
+
+
+@pytest.mark.parametrize("average", [True, False])
+def test_reduce_dict(tmp_path, average):
+    _spawn(tmp_path, average, half_precision=False)
+
+
+def test_reduce_dict_single_process_is_identity():
+    values = _rank_dict(0)
+    assert reduce_dict(values) is values
+
+
+@pytest.mark.parametrize("average", [True, False])
+def test_reduce_dict_half_precision(tmp_path, average):
+    _spawn(tmp_path, average, half_precision=True)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+           """
+
+import pickle
+
+import torch
+
+from neodroidvision.utilities.torch_utilities.distributing.serialisation import (
+    deserialise_byte_tensor,
+    serialise_byte_tensor,
+    to_byte_tensor,
+)
+
+PAYLOADS = [{"boxes": [1, 2, 3]}, "a longer payload than the first", (4.0, None)]
+
+
+def _padded_rows(payloads) -> tuple:
+    encoded = [pickle.dumps(p) for p in payloads]
+    sizes = [len(e) for e in encoded]
+    rows = torch.zeros((len(encoded), max(sizes) + 7), dtype=torch.uint8)
+    for row, e in zip(rows, encoded):
+        row[: len(e)] = torch.tensor(list(e), dtype=torch.uint8)
+    return sizes, rows
+
+
+def test_deserialise_one_tensor_of_rows():
+    sizes, rows = _padded_rows(PAYLOADS)
+    assert deserialise_byte_tensor(sizes, rows) == PAYLOADS
+
+
+def test_deserialise_list_of_tensors():
+    sizes, rows = _padded_rows(PAYLOADS)
+    assert deserialise_byte_tensor(sizes, list(rows.unbind(0))) == PAYLOADS
+
+
+def test_to_byte_tensor_round_trip():
+    tensors = [to_byte_tensor(p, device="cpu") for p in PAYLOADS]
+    for tensor, payload in zip(tensors, PAYLOADS):
+        assert tensor.dtype == torch.uint8
+        assert bytes(tensor.numpy()) == pickle.dumps(payload)
+    sizes = [t.numel() for t in tensors]
+    rows = torch.zeros((len(tensors), max(sizes)), dtype=torch.uint8)
+    for row, tensor in zip(rows, tensors):
+        row[: tensor.numel()] = tensor
+    assert deserialise_byte_tensor(sizes, rows) == PAYLOADS
+
+
+def test_serialise_byte_tensor_reuses_its_staging():
+    encoded = torch.zeros((len(PAYLOADS), 256), dtype=torch.uint8)
+    for row, payload in zip(encoded, PAYLOADS):  # Each encode reuses the staging buffer
+        serialise_byte_tensor(row, payload, device="cpu")
+    sizes = encoded[:, 0].tolist()
+    assert sizes == [len(pickle.dumps(p)) for p in PAYLOADS]
+    assert deserialise_byte_tensor(sizes, encoded[:, 1:]) == PAYLOADS
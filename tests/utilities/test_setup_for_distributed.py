@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Christian Heider Nielsen"
+__doc__ = r"""
+
+           Created on 15/10/2026
+           """
+
+import builtins
+import logging
+import sys
+
+import pytest
+
+from neodroidvision.utilities.torch_utilities.distributing.distributing_utilities import (
+    setup_for_distributed,
+)
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    level, stdout = root.level, sys.stdout
+    root.setLevel(logging.DEBUG)
+    yield root
+    if sys.stdout is not stdout:
+        sys.stdout.close()
+        sys.stdout = stdout
+    root.setLevel(level)
+
+
+def test_silences_non_master_ranks(capsys, root_logger):
+    original_print = builtins.print
+    setup_for_distributed(False)
+    print("silenced")
+    assert builtins.print is original_print  # print is no longer patched
+    assert root_logger.level == logging.WARNING
+    assert "silenced" not in capsys.readouterr().out
+
+
+def test_leaves_the_master_rank_alone(capsys, root_logger):
+    stdout = sys.stdout
+    setup_for_distributed(True)
+    print("shown")
+    assert sys.stdout is stdout
+    assert root_logger.level == logging.DEBUG
+    assert "shown" in capsys.readouterr().out